@@ -1,3 +1,6 @@
 from api import API
+from async_api import AsyncAPI
 from config import Config
-from exception import MambuAPIException
+from exception import MambuAPIException, MambuBatchException
+from replica import Replica
+from version import __version__
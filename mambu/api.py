@@ -1,19 +1,37 @@
+import bisect
 import threading
 import logging
+import collections
+import Queue
+import sys
+import time
+import urllib
 import requests
+import requests.adapters
 import json
 import datetime
-import base64
-import yaml
-import os
+import decimal
+import io
+import uuid
+from multiprocessing.pool import ThreadPool
 
 from tools import datelib
-from exception import MambuAPIException
-
-
-with open(os.path.join(os.path.dirname(__file__), 'etc/data.yaml'), 'r') as f:
-    metadata = yaml.load(f)
+from exception import MambuAPIException, MambuBatchException
+from config import Config
+from retry import RetryPolicy, tenant_rate_limiter
+from cache import MISSING, ResponseCache
+from codec import get_codec, iter_json_array
+from singleflight import SingleFlight
+from cassette import Cassette
+from breaker import CircuitBreakers, STATE_VALUES
+from documents import CountingBody, iter_document_body, write_document_content
+import metrics
+from metadata import load_metadata
+
+
+metadata = load_metadata()
 logger = logging.getLogger(__name__)
+request_logger = logging.getLogger(__name__ + '.requests')
 
 
 class RequestJSONEncoder(json.JSONEncoder):
@@ -39,34 +57,590 @@ class AbstractDataObject(object):
         return self.__dict__[key]
 
 
+class BulkResult(collections.namedtuple(
+        'BulkResult', ['index', 'args', 'result', 'error'])):
+    """Outcome of one item of a bulk call: its position in the input, the
+    arguments it was called with and either the response or the exception
+    raised"""
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class _InlineResult(object):
+    """Runs fn(*args) in the calling thread with the same get() interface as
+    the AsyncResult returned by ThreadPool.apply_async"""
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+
+    def get(self):
+        return self.fn(*self.args)
+
+
+def _closing(response, records):
+    """Yield the records decoded from a streamed response, closing the
+    response once they are exhausted or iteration stops early so that its
+    connection is returned to the pool"""
+    try:
+        for record in records:
+            yield record
+    finally:
+        records.close()
+        response.close()
+
+
+# appended to the notes of transactions to find them when reconciling
+IDEMPOTENCY_TAG = 'idempotency-key:{}'
+
+# transactions that move money, reconciled by their idempotency key
+MONEY_TRANSACTION_TYPES = frozenset([
+    'DISBURSMENT', 'DISBURSEMENT', 'REPAYMENT', 'FEE', 'DEPOSIT',
+    'WITHDRAWAL', 'TRANSFER'])
+
+# transactions that change the state of the account, reconciled by reading
+# the account and comparing its field with the state the transaction leads to
+STATE_TRANSACTION_TYPES = {
+    'APPROVAL': ('accountState', 'APPROVED'),
+    'UNDO_APPROVAL': ('accountState', 'PENDING_APPROVAL'),
+    'REJECT': ('accountState', 'CLOSED_REJECTED'),
+    'WITHDRAW': ('accountState', 'CLOSED_WITHDRAWN'),
+    'LOCK': ('accountSubState', 'LOCKED'),
+    'UNLOCK': ('accountSubState', None)}
+
+# most records mambu returns in one page whatever limit is asked for
+MAX_PAGE_SIZE = 1000
+
+
 class API(object):
     def __init__(self, config_):
         self.config = config_
-        self.base_url = 'https://{}/api/'.format(self.config.domain)
-        self.json_encoder = RequestJSONEncoder()
-
-    def _request(self, method, url, params=None, data=None):
-        headers = {'Content-Type': 'application/json'} if data else {}
-        data_str = self.json_encoder.encode(data)
-        print self, method, self.base_url, url, params, data_str
-        logging.debug("Body: " + data_str)
-        response = getattr(requests, method)(
-            self.base_url + url, headers=headers, params=params, data=data_str,
-            auth=(self.config.username, self.config.password))
-        if response.status_code != 200 and response.status_code != 201:
+        self.base_url = '{}://{}/api/'.format(
+            self._setting('scheme'), self.config.domain)
+        self.codec = get_codec(
+            self._setting('json_codec'), RequestJSONEncoder().default)
+        self.session = self._create_session()
+        self.cassette = None
+        if self._setting('cassette_mode'):
+            self.cassette = Cassette(
+                self._setting('cassette'), self._setting('cassette_mode'))
+        self.retry_policy = RetryPolicy.from_config(self._setting)
+        self.rate_limiter = None
+        if self._setting('rate_limit'):
+            self.rate_limiter = tenant_rate_limiter(
+                self.config.domain, self._setting('rate_limit'),
+                self._setting('rate_limit_burst'))
+        self.cache = None
+        if self._setting('cache_maxsize'):
+            self.cache = ResponseCache(self._setting('cache_maxsize'))
+        self.metrics = None
+        if self._setting('metrics_enabled'):
+            self.metrics = self._setting('metrics_registry') or \
+                metrics.REGISTRY
+        self.breakers = None
+        if self._setting('breaker_threshold'):
+            self.breakers = CircuitBreakers(
+                self._setting('breaker_threshold'),
+                self._setting('breaker_reset'),
+                self._setting('breaker_thresholds'), self._circuit_changed)
+        self.single_flight = None
+        if self._setting('coalesce_reads'):
+            self.single_flight = SingleFlight()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._worker = threading.local()
+
+    def _circuit_changed(self, group, state):
+        logger.warning('Circuit for %s is now %s', group, state)
+        if self.metrics is not None:
+            self.metrics.set_gauge('mambu_circuit_state', (('group', group),),
+                                   STATE_VALUES[state])
+
+    def _setting(self, name):
+        """Return the config value for name, falling back to the default on
+        Config for config objects that do not define it
+
+        Parameters
+        ----------
+        name: str
+            name of the config attribute
+
+        Returns
+        -------
+        object
+        """
+        return getattr(self.config, name, getattr(Config, name))
+
+    def _page_size(self, page_size=None):
+        """Return page_size, or the page_size of the config if it is None.
+        Pagination ends on the first page holding fewer than page_size
+        records, so sizes mambu would cut short are refused
+
+        Parameters
+        ----------
+        page_size: int
+            Optional. Defaults to the page_size of the config
+
+        Returns
+        -------
+        int
+        """
+        if page_size is None:
+            page_size = self._setting('page_size')
+        if not 0 < page_size <= MAX_PAGE_SIZE:
+            raise ValueError('page_size must be between 1 and {}, got {}'
+                             .format(MAX_PAGE_SIZE, page_size))
+        return page_size
+
+    def _create_session(self, pool_maxsize=None):
+        """Create the requests.Session shared by every call made through this
+        API so that connections to mambu are pooled and kept alive between
+        requests.  The underlying urllib3 pools are thread safe so a single
+        session can be used by all threads
+
+        Parameters
+        ----------
+        pool_maxsize: int
+            Optional. Defaults to the pool_maxsize of the config
+
+        Returns
+        -------
+        requests.Session
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self._setting('pool_connections'),
+            pool_maxsize=pool_maxsize or self._setting('pool_maxsize'),
+            pool_block=self._setting('pool_block'))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not self._setting('keep_alive'):
+            session.headers['Connection'] = 'close'
+        return session
+
+    @property
+    def executor(self):
+        """The bounded ThreadPool of max_workers threads shared by every
+        helper of this API that fans requests out concurrently.  It is only
+        started when first needed
+
+        Returns
+        -------
+        multiprocessing.pool.ThreadPool
+        """
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPool(
+                        self._setting('max_workers'), self._mark_worker)
+        return self._executor
+
+    def _mark_worker(self):
+        self._worker.active = True
+
+    def _in_worker(self):
+        """Return True when called from one of the executor threads, in which
+        case fanning out on the executor again could deadlock waiting on
+        itself"""
+        return getattr(self._worker, 'active', False)
+
+    def _fan_out(self, fn, args_list, message):
+        """Call fn(*args) for every args in args_list on the executor and wait
+        for them all
+
+        Parameters
+        ----------
+        fn: callable
+            the function to call for every item
+        args_list: iterable(tuple)
+            positional arguments of each call
+        message: str
+            description used if any of the calls fail
+
+        Returns
+        -------
+        list
+            result of every call in the order of args_list
+
+        Raises
+        ------
+        MambuBatchException
+            once all calls have finished if any of them raised
+        """
+        calls = [self._submit(fn, args) for args in args_list]
+        results, errors = [], {}
+        for n, call in enumerate(calls):
+            try:
+                results.append(call.get())
+            except Exception as e:
+                results.append(None)
+                errors[n] = e
+        if errors:
+            raise MambuBatchException(message, results, errors)
+        return results
+
+    def _submit(self, fn, args):
+        """Schedule fn(*args) on the executor, or to run inline when already
+        on one of its threads
+
+        Returns
+        -------
+        AsyncResult, _InlineResult
+        """
+        if self._in_worker():
+            return _InlineResult(fn, args)
+        return self.executor.apply_async(fn, args)
+
+    def bulk(self, fn, args_iterable):
+        """Call fn(*args) concurrently on the executor for every args in
+        args_iterable, yielding a BulkResult for each call in input order.
+        A failed call is reported in its BulkResult rather than raised, so one
+        bad item never aborts the batch.  args_iterable is consumed lazily and
+        at most twice max_workers calls are in flight at once, so arbitrarily
+        large batches can be streamed through
+
+        Parameters
+        ----------
+        fn: callable
+            the function to call for every item e.g. self.approve
+        args_iterable: iterable(tuple)
+            positional arguments of each call
+
+        Returns
+        -------
+        generator(BulkResult)
+        """
+        window = collections.deque()
+        limit = 2 * self._setting('max_workers')
+        for index, args in enumerate(args_iterable):
+            window.append((index, args, self._submit(fn, args)))
+            if len(window) >= limit:
+                yield self._bulk_result(*window.popleft())
+        while window:
+            yield self._bulk_result(*window.popleft())
+
+    def _bulk_result(self, index, args, call):
+        try:
+            return BulkResult(index, args, call.get(), None)
+        except Exception as e:
+            logger.warning('Bulk item %d failed: %s', index, e)
+            return BulkResult(index, args, None, e)
+
+    def close(self):
+        """Wait for work on the executor to finish and close the pooled
+        connections held by the session"""
+        if self._executor is not None:
+            self._executor.close()
+            self._executor.join()
+            self._executor = None
+        self.session.close()
+        if self.cassette is not None:
+            self.cassette.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _request(self, method, url, params=None, data=None, idempotent=None):
+        """Send the request to mambu and return the decoded json response.
+        GET responses of endpoints with a ttl in the cache_ttls setting are
+        served from the cache when it is enabled, and any other request to an
+        endpoint invalidates its cached responses, including those of GET
+        requests still in flight.  Identical GET requests
+        made concurrently are coalesced into one when coalesce_reads is set
+
+        Parameters
+        ----------
+        method: str
+            http method e.g. 'get'
+        url: str
+            api url relative to base_url
+        params: dict
+            Optional. Defaults to None. query parameters
+        data: object
+            Optional. Defaults to None. body to encode as json
+        idempotent: bool
+            Optional. Defaults to None. Whether the request is safe to retry.
+            If None this is decided by the method of the request
+
+        Returns
+        -------
+        dict, list
+        """
+        if method != 'get':
+            result = self._perform(method, url, params, data, idempotent)
+            if self.cache is not None:
+                self.cache.invalidate(self._endpoint(url))
+            return result
+        endpoint = self._endpoint(url)
+        # encoded rather than kept as a tuple since values may be lists
+        key = (endpoint, url, urllib.urlencode(
+            sorted(self._params_dict(params).items()), doseq=True))
+        ttl = None
+        if self.cache is not None:
+            ttl = self._setting('cache_ttls').get(endpoint)
+            if ttl:
+                result = self.cache.get(key)
+                if result is not MISSING:
+                    return result
+                generation = self.cache.generation(endpoint)
+        if self.single_flight is None or data is not None:
+            result = self._perform(method, url, params, data, idempotent)
+        else:
+            result = self.single_flight.do(key, lambda: self._perform(
+                method, url, params, data, idempotent))
+        if ttl:
+            self.cache.set(key, result, ttl, generation)
+        return result
+
+    def _endpoint(self, url):
+        """Return the top level endpoint of url e.g. 'loans' for
+        'loans/123/transactions'"""
+        return url.split('?', 1)[0].split('/', 1)[0]
+
+    def _perform(self, method, url, params=None, data=None, idempotent=None,
+                 stream=False, body=None, reader=None, headers=None):
+        """Send the request to mambu and return the decoded json response,
+        retrying failures allowed by the retry policy.  Requests to an
+        endpoint group whose circuit is open fail fast with a
+        MambuAPIException.  Takes the same parameters as _request along with
+
+        Parameters
+        ----------
+        stream: bool
+            Optional. Defaults to False. If True the response must be a json
+            array and a generator decoding its elements incrementally as the
+            body is received is returned instead
+        body: function
+            Optional. Defaults to None. Called for every attempt to get an
+            iterable of the chunks of a json body to stream in place of data
+        reader: function
+            Optional. Defaults to None. Called with an iterable of the chunks
+            of a successful response, as they are received, to produce the
+            result in place of decoding the body
+        headers: dict
+            Optional. Defaults to None. extra headers sent with the request
+
+        Returns
+        -------
+        dict, list, generator
+        """
+        headers = dict(headers or {})
+        if data or body:
+            headers['Content-Type'] = 'application/json'
+        data_str = self.codec.encode(data)
+        params = self._params_dict(params) or None
+        stream = stream or reader is not None
+        if idempotent is None:
+            idempotent = self.retry_policy.is_idempotent(method)
+        breaker = None
+        if self.breakers is not None:
+            breaker = self.breakers[self._endpoint(url)]
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                raise MambuAPIException(
+                    'Circuit open for {}, retry in {:.1f}s'.format(
+                        self._endpoint(url), breaker.retry_in()),
+                    503, {'returnStatus': 'CIRCUIT_OPEN'})
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            if body is not None:
+                data_str = CountingBody(body())
+            started = time.time()
             try:
-                message = response.json()
+                response = self._send(
+                    method, url, headers, params, data_str, stream)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record_request(method, url, started, data_str)
+                if breaker is not None:
+                    breaker.record_failure()
+                if not self.retry_policy.should_retry(
+                        attempt, idempotent=idempotent):
+                    raise
+                delay = self.retry_policy.delay(attempt)
             except Exception:
-                message = {'errorSource': response.content, 'returnCode': 950}
-            raise MambuAPIException("Error performing the request",
-                                    response.status_code, message)
-        return response.json()
+                if breaker is not None:
+                    breaker.release()
+                raise
+            else:
+                self._record_request(
+                    method, url, started, data_str, response, stream)
+                status_code = response.status_code
+                if breaker is not None:
+                    if status_code >= 500:
+                        breaker.record_failure()
+                    elif status_code == 429:
+                        breaker.release()
+                    else:
+                        breaker.record_success()
+                if status_code == 200 or status_code == 201:
+                    chunks = self._setting('stream_chunk_size')
+                    if reader is not None:
+                        try:
+                            return reader(self._counting(
+                                method, url, response.iter_content(chunks)))
+                        finally:
+                            response.close()
+                    if stream:
+                        return _closing(response, iter_json_array(
+                            self._counting(
+                                method, url, response.iter_content(chunks)),
+                            self.codec))
+                    return self.codec.decode(response.content)
+                if not self.retry_policy.should_retry(
+                        attempt, status_code, idempotent):
+                    if stream and self.metrics is not None:
+                        self.metrics.observe_received(
+                            method, url, len(response.content))
+                    raise self._exception(response)
+                if stream:
+                    # release the connection of the unread error body
+                    response.close()
+                delay = self.retry_policy.delay(
+                    attempt, response.headers.get('Retry-After'))
+                if status_code == 429 and self.rate_limiter is not None:
+                    self.rate_limiter.penalise(delay)
+            logger.warning('Retrying %s %s in %.2fs after attempt %d failed',
+                           method, url, delay, attempt + 1)
+            if self.metrics is not None:
+                self.metrics.observe_retry(method, url)
+            time.sleep(delay)
+            attempt += 1
+
+    def _record_request(self, method, url, started, data_str, response=None,
+                        stream=False):
+        """Record a single request attempt in the metrics registry and log it
+        to the mambu.api.requests logger with its method, path, status,
+        duration and byte counts as both message arguments and record
+        attributes.  Nothing is formatted unless DEBUG is enabled for the
+        logger
+
+        Parameters
+        ----------
+        method: str
+            http method of the request
+        url: str
+            api url relative to base_url
+        started: float
+            time.time() when the request was sent
+        data_str: str, CountingBody
+            the encoded request body
+        response: requests.Response
+            Optional. Defaults to None when no response was received
+        stream: bool
+            Optional. Defaults to False. If True the body has not been read
+            yet.  The log then reports the Content-Length header, which is 0
+            for chunked responses, while the metrics count the body as it is
+            read, see _counting
+        """
+        log = request_logger.isEnabledFor(logging.DEBUG)
+        if not log and self.metrics is None:
+            return
+        duration = time.time() - started
+        status_code = None if response is None else response.status_code
+        if isinstance(data_str, CountingBody):
+            sent = data_str.sent
+        else:
+            sent = len(data_str) if data_str else 0
+        received = 0
+        if response is not None and not stream:
+            received = len(response.content)
+        if self.metrics is not None:
+            self.metrics.observe_request(
+                method, url, status_code, duration, sent, received)
+        if stream and response is not None:
+            received = int(response.headers.get('Content-Length', 0))
+        if not log:
+            return
+        request_logger.debug(
+            '%s %s %s %.1fms sent=%dB received=%dB', method.upper(), url,
+            status_code, duration * 1000, sent, received, extra=dict(
+                mambu_method=method, mambu_path=url, mambu_status=status_code,
+                mambu_duration=duration, mambu_bytes_sent=sent,
+                mambu_bytes_received=received))
+        if self._setting('log_bodies'):
+            cap = self._setting('log_body_max')
+            if not isinstance(data_str, CountingBody):
+                request_logger.debug('%s %s request body: %s', method.upper(),
+                                     url, (data_str or '')[:cap])
+            if response is not None and not stream:
+                request_logger.debug('%s %s response body: %s', method.upper(),
+                                     url, response.content[:cap])
+
+    def _counting(self, method, url, chunks):
+        """Yield the chunks of a streamed response body, adding their size to
+        the bytes received by the request once they are exhausted or reading
+        stops early
+
+        Parameters
+        ----------
+        method: str
+            http method of the request
+        url: str
+            api url relative to base_url
+        chunks: iterable(str)
+            the body e.g. response.iter_content(65536)
+
+        Returns
+        -------
+        generator(str)
+        """
+        if self.metrics is None:
+            for chunk in chunks:
+                yield chunk
+            return
+        received = 0
+        try:
+            for chunk in chunks:
+                received += len(chunk)
+                yield chunk
+        finally:
+            self.metrics.observe_received(method, url, received)
+
+    def _send(self, method, url, headers, params, data_str, stream=False):
+        """Send a single request over the pooled session, or answer it from
+        the cassette when replaying
+
+        Returns
+        -------
+        requests.Response
+        """
+        # streamed bodies are not kept so are matched as if they were empty
+        recorded = None if isinstance(data_str, CountingBody) else data_str
+        if self.cassette is not None and self.cassette.mode == 'replay':
+            return self.cassette.play(method, url, params, recorded)
+        response = self.session.request(
+            method, self.base_url + url, headers=headers, params=params,
+            data=data_str, auth=(self.config.username, self.config.password),
+            timeout=self._setting('timeout'), stream=stream)
+        if self.cassette is not None:
+            self.cassette.record(method, url, params, recorded, response)
+        return response
+
+    def _exception(self, response):
+        """Build the MambuAPIException describing an unsuccessful response
+
+        Returns
+        -------
+        MambuAPIException
+        """
+        try:
+            message = self.codec.decode(response.content)
+        except Exception:
+            message = {'errorSource': response.content, 'returnCode': 950}
+        return MambuAPIException("Error performing the request",
+                                 response.status_code, message)
 
     def _get(self, url, params=None, data=None):
         return self._request('get', url, params, data)
 
-    def _post(self, url, params=None, data=None):
-        return self._request('post', url, params, data)
+    def _post(self, url, params=None, data=None, idempotent=None):
+        return self._request('post', url, params, data, idempotent)
 
     def _patch(self, url, params=None, data=None):
         return self._request('patch', url, params, data)
@@ -77,6 +651,190 @@ class API(object):
     def _postfix_url(self, *args):
         return '/'.join([arg for arg in args if arg is not None])
 
+    def _iter_pages(self, method, url, params=None, data=None, page_size=None):
+        """Request url one page at a time using the offset and limit
+        parameters, yielding each page as it arrives.  Stops after the first
+        page holding fewer than page_size records, which may not be more than
+        MAX_PAGE_SIZE
+
+        Parameters
+        ----------
+        method: str
+            http method used for every page e.g. 'get' or 'post'
+        url: str
+            api url relative to base_url
+        params: dict, AbstractDataObject
+            Optional. Defaults to None. additional query parameters.  An offset
+            in params is used as the starting offset
+        data: dict
+            Optional. Defaults to None. body sent with every page
+        page_size: int
+            Optional. Defaults to the page_size of the config
+
+        Returns
+        -------
+        generator(list(dict))
+        """
+        page_size = self._page_size(page_size)
+        params = dict(self._params_dict(params), limit=page_size)
+        offset = params.pop('offset', 0)
+        while True:
+            params['offset'] = offset
+            page = self._request(
+                method, url, dict(params), data, idempotent=True)
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            offset += len(page)
+
+    def _iter_records(self, method, url, params=None, data=None,
+                      page_size=None):
+        """Same as _iter_pages but yields the records of each page one by one,
+        decoding them incrementally as each page is received so that only one
+        record at a time is held in memory
+
+        Returns
+        -------
+        generator(dict)
+        """
+        page_size = self._page_size(page_size)
+        params = dict(self._params_dict(params), limit=page_size)
+        offset = params.pop('offset', 0)
+        while True:
+            params['offset'] = offset
+            count = 0
+            records = self._perform(method, url, dict(params), data,
+                                    idempotent=True, stream=True)
+            try:
+                for record in records:
+                    count += 1
+                    yield record
+            finally:
+                # returns the connection to the pool when iteration stops
+                # early
+                records.close()
+            if count < page_size:
+                return
+            offset += count
+
+    def _scan_pages(self, method, url, params=None, data=None, page_size=None,
+                    concurrency=None, ordered=False):
+        """Fetch consecutive offset ranges of url concurrently, yielding each
+        page once it has been received.  New ranges are requested as pages
+        complete until a page holding fewer than page_size records shows the
+        end of the collection has been reached.  page_size may not be more
+        than MAX_PAGE_SIZE
+
+        Parameters
+        ----------
+        method: str
+            http method used for every page e.g. 'get' or 'post'
+        url: str
+            api url relative to base_url
+        params: dict, AbstractDataObject
+            Optional. Defaults to None. additional query parameters.  An offset
+            in params is used as the starting offset
+        data: dict
+            Optional. Defaults to None. body sent with every page
+        page_size: int
+            Optional. Defaults to the page_size of the config
+        concurrency: int
+            Optional. Defaults to the scan_concurrency of the config. Maximum
+            number of pages requested at once, further limited by the size of
+            the executor
+        ordered: bool
+            Optional. Defaults to False. If True pages are yielded in offset
+            order, otherwise in the order they complete
+
+        Returns
+        -------
+        generator(list(dict))
+        """
+        if self._in_worker():
+            for page in self._iter_pages(method, url, params, data, page_size):
+                yield page
+            return
+        page_size = self._page_size(page_size)
+        if concurrency is None:
+            concurrency = self._setting('scan_concurrency')
+        params = self._params_dict(params)
+        next_offset = next_yield = params.pop('offset', 0)
+        end = None
+        pending = 0
+        buffered = {}
+        completed = Queue.Queue()
+        cancelled = threading.Event()
+
+        def fetch(offset):
+            if cancelled.is_set():
+                return
+            page_params = dict(params, offset=offset, limit=page_size)
+            try:
+                completed.put((offset, self._request(
+                    method, url, page_params, data, idempotent=True), None))
+            except Exception:
+                completed.put((offset, None, sys.exc_info()))
+
+        try:
+            while True:
+                # when ordered, only fetch within a window of concurrency pages
+                # from the next page due so that buffered pages stay bounded
+                while end is None and pending < concurrency and (
+                        not ordered or
+                        next_offset < next_yield + concurrency * page_size):
+                    self.executor.apply_async(fetch, (next_offset,))
+                    next_offset += page_size
+                    pending += 1
+                if not pending:
+                    return
+                offset, page, exc_info = completed.get()
+                pending -= 1
+                if exc_info is not None:
+                    raise exc_info[0], exc_info[1], exc_info[2]
+                if len(page) < page_size and (
+                        end is None or offset + len(page) < end):
+                    end = offset + len(page)
+                if not ordered:
+                    if page:
+                        yield page
+                    continue
+                buffered[offset] = page
+                while next_yield in buffered:
+                    page = buffered.pop(next_yield)
+                    if page:
+                        yield page
+                    next_yield += page_size
+        finally:
+            # fetches still queued when iteration stops early, or a page
+            # fails, return without requesting their page
+            cancelled.set()
+
+    def _scan_records(self, method, url, params=None, data=None,
+                      page_size=None, concurrency=None, ordered=False):
+        """Same as _scan_pages but yields the records of each page one by one
+
+        Returns
+        -------
+        generator(dict)
+        """
+        for page in self._scan_pages(method, url, params, data, page_size,
+                                     concurrency, ordered):
+            for record in page:
+                yield record
+
+    def _params_dict(self, params):
+        """Return params as a dict whether given as None, a dict or one of
+        the AbstractDataObject parameter classes
+
+        Returns
+        -------
+        dict
+        """
+        if isinstance(params, AbstractDataObject):
+            params = params.__dict__
+        return dict(params or {})
+
     def get_client(self, client_id=None, params=None):
         """Get the details for the client from mambu
 
@@ -92,6 +850,50 @@ class API(object):
         """
         return self._get(self._url_clients(client_id), params)
 
+    def iter_clients(self, params=None, page_size=None):
+        """Lazily iterate over every client in mambu, requesting page_size
+        clients at a time
+
+        Parameters
+        ----------
+        params: dict, GetClientParams
+            Optional. Defaults to None. parameters to use for filtering
+        page_size: int
+            Optional. Defaults to the page_size of the config
+
+        Returns
+        -------
+        generator(dict)
+        """
+        return self._iter_records(
+            'get', self._url_clients(), params, page_size=page_size)
+
+    def scan_clients(self, params=None, page_size=None, concurrency=None,
+                     ordered=False):
+        """Iterate over every client in mambu, fetching several pages of
+        page_size clients concurrently
+
+        Parameters
+        ----------
+        params: dict, GetClientParams
+            Optional. Defaults to None. parameters to use for filtering
+        page_size: int
+            Optional. Defaults to the page_size of the config
+        concurrency: int
+            Optional. Defaults to the scan_concurrency of the config. Maximum
+            number of pages requested at once
+        ordered: bool
+            Optional. Defaults to False. If True clients are yielded in the
+            order mambu returns them, otherwise as pages complete
+
+        Returns
+        -------
+        generator(dict)
+        """
+        return self._scan_records(
+            'get', self._url_clients(), params, page_size=page_size,
+            concurrency=concurrency, ordered=ordered)
+
     def get_client_full_details(self, client_id):
         """Get the full details for the client associated with client_id by
         setting fullDetails=True in parameters
@@ -130,6 +932,21 @@ class API(object):
         return self._create_or_update_client(
             None, client, addresses, custom_information, id_documents)
 
+    def bulk_create_clients(self, clients):
+        """Create every client in clients concurrently, see bulk
+
+        Parameters
+        ----------
+        clients: iterable(Client)
+            the clients to create in mambu
+
+        Returns
+        -------
+        generator(BulkResult)
+            outcome of create_client for each client in input order
+        """
+        return self.bulk(self.create_client, ((client,) for client in clients))
+
     def update_client(self, client_id, client, addresses=None,
                       custom_information=None, id_documents=None):
         """Update the client in mambu with client_id using the data provided in
@@ -213,8 +1030,8 @@ class API(object):
                            data={'value': value})
 
     def set_client_list_custom_field(self, client_id, custom_fields):
-        """Iterate through the custom_fields specified in custom_fields and call
-        set_custom_field on each one
+        """Call set_client_custom_field concurrently on the executor for each
+        of the custom_fields
 
         Parameters
         ----------
@@ -225,16 +1042,19 @@ class API(object):
 
         Returns
         -------
+        list(dict)
+            response for each custom field in the order of custom_fields
 
+        Raises
+        ------
+        MambuBatchException
+            if setting any of the custom fields failed, once all have been
+            attempted
         """
-        threads = [
-                threading.Thread(
-                    target=self.set_client_custom_field,
-                    args=(client_id, field.customFieldID, field.value)
-                ) for field in custom_fields
-        ]
-        [t.start() for t in threads]
-        [t.join() for t in threads]
+        return self._fan_out(self.set_client_custom_field, [
+            (client_id, field.customFieldID, field.value)
+            for field in custom_fields],
+            'Error setting custom fields for client {}'.format(client_id))
 
     def delete_client_custom_field(self, client_id, custom_field_id,
                                    index=None):
@@ -286,9 +1106,33 @@ class API(object):
         """
         return self._get(self._postfix_url('documents', document_id))
 
-    def create_attachment(self, document_holder_key, document_holder_type, name,
-                          document_type, document_content):
-        """Upload the document with content document_content
+    def download_attachment(self, document_id, sink):
+        """Stream the content of the attachment/document associated with
+        document_id to sink, base64 decoding it as it is received so the
+        whole document is never held in memory
+
+        Parameters
+        ----------
+        document_id: int, str
+            id or encodedKey for the document in mambu
+        sink: file
+            object with a write method e.g. a file open for writing in binary
+            mode
+
+        Returns
+        -------
+        dict
+            the document fields without documentContent
+        """
+        return self._perform(
+            'get', self._postfix_url('documents', document_id),
+            reader=lambda chunks: write_document_content(
+                chunks, sink, self.codec))
+
+    def upload_attachment(self, document_holder_key, document_holder_type,
+                          name, document_type, fileobj):
+        """Upload the document with the content read from fileobj, base64
+        encoding it and streaming the request body a chunk at a time
 
         Parameters
         ----------
@@ -300,8 +1144,10 @@ class API(object):
             name of the document
         document_type: str
             the attachment file extension
-        document_content: base64 encoded string
-            The content of the document
+        fileobj: file
+            file object open for reading in binary mode.  It is read from its
+            current position, which it is returned to when the upload is
+            retried
         Returns
         -------
         dict
@@ -309,9 +1155,41 @@ class API(object):
         document = dict(
             documentHolderKey=document_holder_key, type=document_type,
             documentHolderType=document_holder_type, name=name)
-        return self._post('documents', data=dict(
-                document=document,
-                documentContent=base64.b64encode(document_content)))
+        start = fileobj.tell()
+
+        def body():
+            fileobj.seek(start)
+            return iter_document_body(
+                document, fileobj, self._setting('stream_chunk_size'),
+                self.codec)
+        result = self._perform('post', 'documents', body=body)
+        if self.cache is not None:
+            self.cache.invalidate('documents')
+        return result
+
+    def create_attachment(self, document_holder_key, document_holder_type, name,
+                          document_type, document_content):
+        """Upload the document with content document_content
+
+        Parameters
+        ----------
+        document_holder_key: str
+            encodedKey for the document holder in mambu
+        document_holder_type: str
+            the type of document being uploaded
+        name: str
+            name of the document
+        document_type: str
+            the attachment file extension
+        document_content: str
+            The content of the document, which is base64 encoded for upload
+        Returns
+        -------
+        dict
+        """
+        return self.upload_attachment(
+            document_holder_key, document_holder_type, name, document_type,
+            io.BytesIO(document_content))
 
     def delete_attachment(self, document_id):
         """Delete the document associated with document_id
@@ -348,6 +1226,44 @@ class API(object):
                 entity, _entities))
         return self._get(self._postfix_url(entity, entity_id, 'documents'))
 
+    def get_attachments_by_entity(self, entity, entity_id, sink=None):
+        """Fetch the documents/attachments associated with the entity of type
+        entity and entity_id along with their content, downloading them
+        concurrently on the executor
+
+        Parameters
+        ----------
+        entity: str
+            One of the standard entities e.g. clients, loans etc.
+        entity_id: int, str
+            id or encodedKey of the entity in mambu
+        sink: callable
+            Optional. Defaults to None. Called with the fields of each document
+            to get the file object its content is streamed to.  If None the
+            content is returned in the documentContent field of each document
+
+        Returns
+        -------
+        list
+            the result of get_attachment, or of download_attachment if sink is
+            given, for each document of the entity
+
+        Raises
+        ------
+        MambuBatchException
+            if any of the documents could not be fetched
+        """
+        documents = self.get_attachment_by_entity(entity, entity_id)
+        if sink is None:
+            return self._fan_out(
+                self.get_attachment, [(d['encodedKey'],) for d in documents],
+                'Error fetching documents of {} {}'.format(entity, entity_id))
+        return self._fan_out(
+            lambda document: self.download_attachment(
+                document['encodedKey'], sink(document)),
+            [(d,) for d in documents],
+            'Error fetching documents of {} {}'.format(entity, entity_id))
+
     def get_loan(self, loan_id=None, params=None):
         """Get the loan details for the particular loan_id
 
@@ -364,6 +1280,50 @@ class API(object):
         """
         return self._get(self._url_loans(loan_id), params)
 
+    def iter_loans(self, params=None, page_size=None):
+        """Lazily iterate over every loan in mambu, requesting page_size loans
+        at a time
+
+        Parameters
+        ----------
+        params: dict, GetLoanParams
+            Optional. Defaults to None. params for filtering the loans
+        page_size: int
+            Optional. Defaults to the page_size of the config
+
+        Returns
+        -------
+        generator(dict)
+        """
+        return self._iter_records(
+            'get', self._url_loans(), params, page_size=page_size)
+
+    def scan_loans(self, params=None, page_size=None, concurrency=None,
+                   ordered=False):
+        """Iterate over every loan in mambu, fetching several pages of
+        page_size loans concurrently
+
+        Parameters
+        ----------
+        params: dict, GetLoanParams
+            Optional. Defaults to None. params for filtering the loans
+        page_size: int
+            Optional. Defaults to the page_size of the config
+        concurrency: int
+            Optional. Defaults to the scan_concurrency of the config. Maximum
+            number of pages requested at once
+        ordered: bool
+            Optional. Defaults to False. If True loans are yielded in the
+            order mambu returns them, otherwise as pages complete
+
+        Returns
+        -------
+        generator(dict)
+        """
+        return self._scan_records(
+            'get', self._url_loans(), params, page_size=page_size,
+            concurrency=concurrency, ordered=ordered)
+
     def get_loan_full_details(self, loan_id):
         """Get the loan details with the fullDetails parameter set to True
 
@@ -388,6 +1348,108 @@ class API(object):
     def get_savings(self, saving_id=None, params=None):
         return self._get(self._url_savings(saving_id), params=params)
 
+    def iter_savings(self, params=None, page_size=None):
+        """Lazily iterate over every savings account in mambu, requesting
+        page_size accounts at a time
+
+        Parameters
+        ----------
+        params: dict
+            Optional. Defaults to None. params for filtering the accounts
+        page_size: int
+            Optional. Defaults to the page_size of the config
+
+        Returns
+        -------
+        generator(dict)
+        """
+        return self._iter_records(
+            'get', self._url_savings(), params, page_size=page_size)
+
+    def scan_savings(self, params=None, page_size=None, concurrency=None,
+                     ordered=False):
+        """Iterate over every savings account in mambu, fetching several
+        pages of page_size accounts concurrently
+
+        Parameters
+        ----------
+        params: dict
+            Optional. Defaults to None. params for filtering the accounts
+        page_size: int
+            Optional. Defaults to the page_size of the config
+        concurrency: int
+            Optional. Defaults to the scan_concurrency of the config. Maximum
+            number of pages requested at once
+        ordered: bool
+            Optional. Defaults to False. If True accounts are yielded in the
+            order mambu returns them, otherwise as pages complete
+
+        Returns
+        -------
+        generator(dict)
+        """
+        return self._scan_records(
+            'get', self._url_savings(), params, page_size=page_size,
+            concurrency=concurrency, ordered=ordered)
+
+    def loans_to_frame(self, params=None, page_size=None, tranches=False):
+        """Stream every loan in mambu into a typed DataFrame, see
+        mambu.frames.loans_frame
+
+        Parameters
+        ----------
+        params: dict
+            Optional. Defaults to None. params for filtering the loans
+        page_size: int
+            Optional. Defaults to the page_size of the config
+        tranches: bool
+            Optional. Defaults to False. If True the frame has a row for every
+            tranche of the loans
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        import frames
+        return frames.loans_frame(self.iter_loans(params, page_size), tranches)
+
+    def transactions_to_frame(self, loan_id, page_size=None):
+        """Stream every transaction of the loan with loan_id into a typed
+        DataFrame, see mambu.frames.transactions_frame
+
+        Parameters
+        ----------
+        loan_id: str
+            id of the loan in mambu
+        page_size: int
+            Optional. Defaults to the page_size of the config
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        import frames
+        return frames.transactions_frame(self._iter_records(
+            'get', self._url_loan_transactions(loan_id), page_size=page_size))
+
+    def savings_to_frame(self, params=None, page_size=None):
+        """Stream every savings account in mambu into a typed DataFrame, see
+        mambu.frames.savings_frame
+
+        Parameters
+        ----------
+        params: dict
+            Optional. Defaults to None. params for filtering the accounts
+        page_size: int
+            Optional. Defaults to the page_size of the config
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        import frames
+        return frames.savings_frame(self.iter_savings(params, page_size))
+
     def get_savings_transactions(self, savings_id):
         return self._get(self._url_savings_transactions(savings_id))
 
@@ -432,12 +1494,114 @@ class API(object):
         -------
         dict
         """
-        return self._post(self._url_loan_transactions(loan_id),
-                          data=loan_transaction)
+        return self._post_transaction(
+            self._url_loan_transactions(loan_id), self._url_loans(loan_id),
+            loan_transaction)
+
+    def _post_transaction(self, url, account_url, transaction):
+        """Post transaction to url.  With the idempotent_transactions setting
+        a post that fails without a response from mambu, or with a 5xx
+        response, is reconciled before it is sent again, so a transaction
+        that was applied is returned instead of being booked twice.
+
+        Transactions that move money are tagged with an idempotency key,
+        sent as the Idempotency-Key header and appended to their notes, and
+        are reconciled by searching every transaction of the account for the
+        key, since the order mambu lists them in is not relied on.
+        Transactions that only change the state of the account,
+        e.g. APPROVAL, are reconciled by reading the account at account_url
+        and returning it if it is already in the state the transaction
+        leads to.  Any other transaction is posted once
+
+        Parameters
+        ----------
+        url: str
+            transactions url of the account
+        account_url: str
+            url of the account
+        transaction: dict
+            the details of the transaction
+
+        Returns
+        -------
+        dict
+        """
+        kind = transaction.get('type')
+        if not self._setting('idempotent_transactions') or not (
+                kind in MONEY_TRANSACTION_TYPES or
+                kind in STATE_TRANSACTION_TYPES):
+            return self._post(url, data=transaction)
+        headers = None
+        if kind in MONEY_TRANSACTION_TYPES:
+            key = str(uuid.uuid4())
+            tag = IDEMPOTENCY_TAG.format(key)
+            transaction = dict(transaction)
+            notes = transaction.get('notes')
+            transaction['notes'] = '{} {}'.format(notes, tag) if notes else tag
+            headers = {'Idempotency-Key': key}
+        attempt = 0
+        try:
+            while True:
+                try:
+                    return self._perform('post', url, data=transaction,
+                                         idempotent=False, headers=headers)
+                except (requests.ConnectionError, requests.Timeout,
+                        MambuAPIException) as e:
+                    if isinstance(e, MambuAPIException) and (
+                            e.code < 500 or e.return_status == 'CIRCUIT_OPEN'):
+                        raise
+                    if not self.retry_policy.should_retry(attempt):
+                        raise
+                    logger.warning(
+                        'Reconciling %s transaction on %s after attempt %d '
+                        'failed', kind, url, attempt + 1)
+                    time.sleep(self.retry_policy.delay(attempt))
+                    if headers is None:
+                        applied = self._applied_state(account_url, kind)
+                    else:
+                        applied = self._applied_transaction(url, tag)
+                    if applied is not None:
+                        return applied
+                    attempt += 1
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(self._endpoint(url))
+
+    def _applied_transaction(self, url, tag):
+        """Return the transaction at url whose notes hold tag, or None if
+        there is none.  Every transaction is searched whatever order mambu
+        lists them in"""
+        for applied in self._iter_records('get', url):
+            if tag in (applied.get('comment') or applied.get('notes') or ''):
+                return applied
+        return None
+
+    def _applied_state(self, account_url, kind):
+        """Return the account at account_url if it is in the state a
+        transaction of type kind leads to, otherwise None"""
+        field, state = STATE_TRANSACTION_TYPES[kind]
+        account = self._perform('get', account_url, idempotent=True)
+        return account if account.get(field) == state else None
+
+    def bulk_loan_transactions(self, transactions):
+        """Post every loan transaction concurrently, see bulk
+
+        Parameters
+        ----------
+        transactions: iterable(tuple)
+            (loan_id, loan_transaction) pairs e.g.
+            ('ABC123', dict(type='REPAYMENT', amount=100))
+
+        Returns
+        -------
+        generator(BulkResult)
+            outcome of each transaction in input order
+        """
+        return self.bulk(self._post_loan_transaction, transactions)
 
     def get_custom_field_sets(self, _type=None):
-        url = 'customfieldsets' + ('' if _type is None else '?type=%s' % _type)
-        return self._get(url)
+        params = None if _type is None else dict(type=_type)
+        return self._get('customfieldsets', params)
 
     def create_loan(self, loan, custom_information=None):
         """Create a loan in mambu defined by the information in loan and
@@ -457,6 +1621,21 @@ class API(object):
         return self._post(self._url_loans(), data=dict(
             loanAccount=loan, customInformation=custom_information))
 
+    def bulk_create_loans(self, loans):
+        """Create every loan in loans concurrently, see bulk
+
+        Parameters
+        ----------
+        loans: iterable(dict)
+            data associated with each loan
+
+        Returns
+        -------
+        generator(BulkResult)
+            outcome of create_loan for each loan in input order
+        """
+        return self.bulk(self.create_loan, ((loan,) for loan in loans))
+
     def update_loan(self, loan_id, loan, custom_information=None):
         """Update the loan with loan_id using details in loan and
         custom_information
@@ -569,30 +1748,147 @@ class API(object):
         list(dict)
         """
         return self._post(self._url_loans('search'),
-                          data=dict(filterConstraints=filter_constraints))
+                          data=dict(filterConstraints=filter_constraints),
+                          idempotent=True)
+
+    def iter_search(self, filter_constraints, entity='loans', page_size=None):
+        """Lazily iterate over every entity matching the filter constraints,
+        requesting page_size results at a time
+
+        Parameters
+        ----------
+        filter_constraints: list(dict)
+            each element of the list should be a a filterConstraint with at
+            least the fields filterSelection and filterElement
+        entity: str
+            Optional. Defaults to 'loans'. One of loans, clients or savings
+        page_size: int
+            Optional. Defaults to the page_size of the config
+
+        Returns
+        -------
+        generator(dict)
+        """
+        _entities = ['loans', 'clients', 'savings']
+        if entity not in _entities:
+            raise Exception('{} not found.  Must be one of {}'.format(
+                entity, _entities))
+        return self._iter_records(
+            'post', self._postfix_url(entity, 'search'),
+            data=dict(filterConstraints=filter_constraints),
+            page_size=page_size)
+
+    def _iter_pending_tranches(self, start, end=None):
+        """Lazily iterate over the tranches not yet disbursed that are expected
+        to be disbursed from start to end inclusive.  Only APPROVED and ACTIVE
+        loans are requested, a page at a time, and the dates of tranches are
+        compared as yyyy-MM-dd strings rather than parsed
+
+        Parameters
+        ----------
+        start: date, datetime, str
+            first expected disbursement date
+        end: date, datetime, str
+            Optional. Defaults to start. last expected disbursement date
+
+        Returns
+        -------
+        generator(tuple)
+            (loan, tranche, day) where day is the yyyy-MM-dd expected
+            disbursement date of the tranche
+        """
+        first = datelib.mambu_date(start)
+        last = first if end is None else datelib.mambu_date(end)
+        loans = self.iter_search([dict(
+            filterSelection='ACCOUNT_STATE', filterElement='IN',
+            values=['APPROVED', 'ACTIVE'])])
+        for loan in loans:
+            for tranche in loan.get('tranches') or ():
+                if 'disbursementTransactionKey' in tranche:
+                    continue
+                day = datelib.mambu_day(tranche['expectedDisbursementDate'])
+                if first <= day <= last:
+                    yield loan, tranche, day
 
     def get_disbursements_due_on_date(self, datestr):
+        """Return the tranches of APPROVED and ACTIVE loans due to be
+        disbursed on datestr.  Loans with more than one tranche pending on
+        the date are logged and left out
+
+        Parameters
+        ----------
+        datestr: date, datetime, str
+            the expected disbursement date
+
+        Returns
+        -------
+        list(dict)
+        """
+        pending = collections.OrderedDict()
+        for loan, tranche, _ in self._iter_pending_tranches(datestr):
+            pending.setdefault(loan['id'], (loan, []))[1].append(tranche)
         result = []
-        loans = self.get_loan()
-        _date = datelib.coerce_date(datestr)
-        for loan in loans:
-            pending_tranches = [
-                t for t in loan['tranches']
-                if 'disbursementTransactionKey' not in t
-                and datelib.coerce_date(t['expectedDisbursementDate']) == _date]
-            if len(pending_tranches) == 1:
-                tranche = pending_tranches[0]
-                amount = float(tranche['amount'])
-                result.append(dict(
-                    trancheEncodedKey=tranche['encodedKey'], amount=amount,
-                    loanEncodedKey=loan['encodedKey'],
-                    accountHolderKey=loan['accountHolderKey'], loanId=loan['id'],
-                    expectedDisbursementDate=tranche['expectedDisbursementDate']))
-            elif len(pending_tranches) > 1:
+        for loan, tranches in pending.itervalues():
+            if len(tranches) > 1:
                 logger.warning('%s has too many tranches pending on %s' % (
                     loan['id'], datestr))
+                continue
+            tranche = tranches[0]
+            result.append(dict(
+                trancheEncodedKey=tranche['encodedKey'],
+                amount=float(tranche['amount']),
+                loanEncodedKey=loan['encodedKey'],
+                accountHolderKey=loan['accountHolderKey'], loanId=loan['id'],
+                expectedDisbursementDate=tranche['expectedDisbursementDate']))
         return result
 
+    def forecast_disbursements(self, start, end):
+        """Forecast the disbursements of the tranches expected from start to
+        end in a single pass over the pending tranches.  Tranches expected on
+        a weekend or UK bank holiday are counted on the next business day,
+        including those expected in the days off just before start.  Amounts
+        are summed as Decimal so totals are exact
+
+        Parameters
+        ----------
+        start: date, datetime, str
+            first day of the forecast
+        end: date, datetime, str
+            last day of the forecast
+
+        Returns
+        -------
+        OrderedDict
+            maps every business day from start to end, and any later day that
+            tranches expected at the end of the range roll onto, to a dict with
+            the total amount and the list of disbursements in the form
+            returned by get_disbursements_due_on_date, with Decimal amounts
+        """
+        # extend past end so that tranches late in the range have a business
+        # day to roll onto
+        bdays = datelib.bdays_between(
+            start, datelib.coerce_date(end) + datetime.timedelta(days=10))
+        keys = [datelib.mambu_date(d) for d in bdays]
+        last = datelib.mambu_date(end)
+        forecast = collections.OrderedDict(
+            (d, dict(total=decimal.Decimal(0), disbursements=[]))
+            for d, key in zip(bdays, keys) if key <= last)
+        # tranches expected after the business day before start roll onto the
+        # first business day of the forecast
+        first = datelib.next_n_bday(bdays[0], -1) + datetime.timedelta(days=1)
+        for loan, tranche, day in self._iter_pending_tranches(first, end):
+            bday = bdays[bisect.bisect_left(keys, day)]
+            amount = decimal.Decimal(str(tranche['amount']))
+            bucket = forecast.setdefault(
+                bday, dict(total=decimal.Decimal(0), disbursements=[]))
+            bucket['total'] += amount
+            bucket['disbursements'].append(dict(
+                trancheEncodedKey=tranche['encodedKey'], amount=amount,
+                loanEncodedKey=loan['encodedKey'],
+                accountHolderKey=loan['accountHolderKey'], loanId=loan['id'],
+                expectedDisbursementDate=tranche['expectedDisbursementDate']))
+        return forecast
+
     def get_disbursements_due_today(self):
         """Return a list of loans with expectedDisbursementDate today.  Specific
         use of the more general get_loans_by_filter_field
@@ -633,9 +1929,25 @@ class API(object):
             savingsAccount=savings_account,
             customInformation=custom_information))
 
-    def create_savings_transaction(self, savings_id, savings_transaction=None):
-        return self._post(self._url_savings_transactions(
-            savings_id, savings_transaction))
+    def create_savings_transaction(self, savings_id, savings_transaction):
+        """Post savings_transaction to the savings account with savings_id,
+        see _post_transaction
+
+        Parameters
+        ----------
+        savings_id: str
+            id or encodedKey of savings in mambu
+        savings_transaction: dict
+            the details of the transaction e.g.
+            dict(type='DEPOSIT', amount=100)
+
+        Returns
+        -------
+        dict
+        """
+        return self._post_transaction(
+            self._url_savings_transactions(savings_id),
+            self._url_savings(savings_id), savings_transaction)
 
     def update_savings(
             self, savings_id, savings_account, custom_information=None):
@@ -0,0 +1,83 @@
+import functools
+import inspect
+from multiprocessing.pool import ThreadPool
+
+from api import API
+
+
+class AsyncAPI(object):
+    """Non-blocking counterpart of API.  Every public method of API is
+    available with the same signature but returns immediately with an
+    AsyncResult; call .get() on the result to wait for the response.  Errors
+    from mambu are raised as MambuAPIException from .get()
+
+    Requests are run on a bounded pool of worker threads which all share the
+    pooled session of the wrapped API, so URL building and error handling are
+    exactly those of API.  The connection pool of the session is grown to
+    max_workers connections when the pool_maxsize of the config is smaller
+
+    Parameters
+    ----------
+    config_: Config
+        configuration passed to API
+    max_workers: int
+        Optional. Defaults to the async_max_workers of the config. Maximum
+        number of requests in flight at once
+    """
+    Client = API.Client
+    GetClientParams = API.GetClientParams
+    ClientCustomField = API.ClientCustomField
+    ClientAddress = API.ClientAddress
+    ClientIdDocument = API.ClientIdDocument
+    GetLoanParams = API.GetLoanParams
+    Loan = API.Loan
+    FilterField = API.FilterField
+
+    def __init__(self, config_, max_workers=None):
+        self.api = API(config_)
+        if max_workers is None:
+            max_workers = self.api._setting('async_max_workers')
+        if max_workers > self.api._setting('pool_maxsize'):
+            self.api.session.close()
+            self.api.session = self.api._create_session(max_workers)
+        self.pool = ThreadPool(max_workers)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the worker pool
+
+        Returns
+        -------
+        multiprocessing.pool.AsyncResult
+        """
+        return self.pool.apply_async(fn, args, kwargs)
+
+    def close(self):
+        """Wait for outstanding requests to finish and release the worker
+        threads and pooled connections"""
+        self.pool.close()
+        self.pool.join()
+        self.api.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _async_method(name):
+    method = getattr(API, name)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.submit(getattr(self.api, name), *args, **kwargs)
+    return wrapper
+
+
+# the iter_*, scan_* and bulk* methods return lazy generators which are
+# consumed by the caller so there is nothing to gain from running them on the
+# pool
+for _name, _member in inspect.getmembers(API, inspect.ismethod):
+    if not _name.startswith(('_', 'iter_', 'scan_', 'bulk')) and \
+            not hasattr(AsyncAPI, _name):
+        setattr(AsyncAPI, _name, _async_method(_name))
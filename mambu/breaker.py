@@ -0,0 +1,145 @@
+import threading
+import time
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# value of the mambu_circuit_state gauge for each state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker(object):
+    """Stops requests to a failing group of endpoints.  The circuit opens
+    after threshold consecutive failures and requests are refused until
+    reset_timeout seconds have passed, when a single probe request is let
+    through.  The circuit closes again if the probe succeeds and reopens if it
+    fails
+
+    Parameters
+    ----------
+    threshold: int
+        consecutive failures that open the circuit
+    reset_timeout: float
+        seconds the circuit stays open before a probe is allowed
+    on_change: callable
+        Optional. Defaults to None. Called with the new state whenever it
+        changes
+    clock: callable
+        Optional. Defaults to time.time
+    """
+    def __init__(self, threshold, reset_timeout, on_change=None,
+                 clock=time.time):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.on_change = on_change
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        self.state = state
+        if self.on_change is not None:
+            self.on_change(state)
+
+    def allow(self):
+        """Return whether a request may be sent, taking the probe of a half
+        open circuit if it is free
+
+        Returns
+        -------
+        bool
+        """
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                self.probing = False
+                self.opened_at = self.clock()
+                self._set_state(OPEN)
+
+    def release(self):
+        """Free the probe of a half open circuit without judging the
+        outcome of the request, e.g. when it was throttled"""
+        with self.lock:
+            self.probing = False
+
+    def retry_in(self):
+        """Seconds until the open circuit allows a probe"""
+        with self.lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+
+class CircuitBreakers(object):
+    """CircuitBreaker for every group of endpoints, created on first use
+
+    Parameters
+    ----------
+    threshold: int
+        default number of consecutive failures that open a circuit
+    reset_timeout: float
+        seconds a circuit stays open before a probe is allowed
+    thresholds: dict
+        Optional. Defaults to None. maps a group to its own threshold
+    on_change: callable
+        Optional. Defaults to None. Called with the group and its new state
+        whenever the state of a circuit changes
+    """
+    def __init__(self, threshold, reset_timeout, thresholds=None,
+                 on_change=None):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.thresholds = thresholds or {}
+        self.on_change = on_change
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def __getitem__(self, group):
+        with self.lock:
+            breaker = self.breakers.get(group)
+            if breaker is None:
+                on_change = None
+                if self.on_change is not None:
+                    on_change = lambda state: self.on_change(group, state)
+                breaker = CircuitBreaker(
+                    self.thresholds.get(group, self.threshold),
+                    self.reset_timeout, on_change)
+                self.breakers[group] = breaker
+            return breaker
+
+    def states(self):
+        """Return the state of every circuit
+
+        Returns
+        -------
+        dict
+        """
+        with self.lock:
+            return dict((group, breaker.state)
+                        for group, breaker in self.breakers.items())
@@ -0,0 +1,107 @@
+import collections
+import copy
+import threading
+import time
+
+
+MISSING = object()
+
+
+class ResponseCache(object):
+    """Thread safe LRU cache of decoded responses where every entry expires
+    after its own time to live.  Entries are grouped by endpoint so that all
+    responses of an endpoint can be invalidated at once after a write.  Each
+    invalidation also advances the generation of the endpoint, so that a
+    response requested before the write is not stored after it
+
+    Parameters
+    ----------
+    maxsize: int
+        maximum number of responses kept before the least recently used are
+        evicted
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.epoch = 0
+        self.generations = {}
+
+    def generation(self, endpoint):
+        """Return the generation of endpoint, to be passed to set along with
+        the response requested after calling this"""
+        with self.lock:
+            return self.epoch, self.generations.get(endpoint, 0)
+
+    def get(self, key):
+        """Return a copy of the response cached for key, or MISSING if there
+        is none or it has expired
+
+        Parameters
+        ----------
+        key: tuple
+            (endpoint, url, params) identifying the response
+
+        Returns
+        -------
+        object
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return MISSING
+            self.entries[key] = entry
+            self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def set(self, key, value, ttl, generation=None):
+        """Cache value under key for ttl seconds, unless the endpoint of key
+        has been invalidated since generation was taken
+
+        Parameters
+        ----------
+        key: tuple
+            (endpoint, url, params) identifying the response
+        value: object
+            the decoded response
+        ttl: float
+            seconds before the entry expires
+        generation: tuple
+            Optional. Defaults to None. generation of the endpoint taken
+            before value was requested, see generation
+        """
+        entry = (time.time() + ttl, copy.deepcopy(value))
+        with self.lock:
+            if generation is not None and generation != (
+                    self.epoch, self.generations.get(key[0], 0)):
+                return
+            self.entries.pop(key, None)
+            self.entries[key] = entry
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, endpoint=None):
+        """Drop every cached response for endpoint, or the whole cache if
+        endpoint is None"""
+        with self.lock:
+            if endpoint is None:
+                self.epoch += 1
+                self.entries.clear()
+                return
+            self.generations[endpoint] = self.generations.get(endpoint, 0) + 1
+            for key in [k for k in self.entries if k[0] == endpoint]:
+                del self.entries[key]
+
+    def stats(self):
+        """Return the hit and miss counters along with the current size
+
+        Returns
+        -------
+        dict
+        """
+        with self.lock:
+            return dict(hits=self.hits, misses=self.misses,
+                        size=len(self.entries), maxsize=self.maxsize)
@@ -0,0 +1,134 @@
+import base64
+import collections
+import gzip
+import json
+import threading
+
+
+class CassetteError(Exception):
+    """Raised when replaying a request that was never recorded"""
+
+
+class ReplayedResponse(object):
+    """Recorded response offering the parts of requests.Response used by
+    API"""
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        for n in range(0, len(self.content), chunk_size):
+            yield self.content[n:n + chunk_size]
+
+
+def _canonical_body(data_str):
+    """Return the body with keys sorted so that bodies built from dicts in a
+    different order still match"""
+    if not data_str:
+        return data_str
+    try:
+        return json.dumps(json.loads(data_str), sort_keys=True)
+    except ValueError:
+        return data_str
+
+
+def request_key(method, url, params, data_str):
+    """Key a recorded request is matched on: method, path, params and body
+
+    Returns
+    -------
+    tuple
+    """
+    params = tuple(sorted(
+        (unicode(k), unicode(v)) for k, v in (params or {}).items()))
+    return method.upper(), url, params, _canonical_body(data_str)
+
+
+class Cassette(object):
+    """Gzipped json lines file of request/response pairs.  In record mode
+    every interaction is appended as it happens.  In replay mode identical
+    requests are answered with their recorded responses in the order they
+    were recorded, the last response being repeated once the others have been
+    used.  Response bodies are stored base64 encoded, as their encoding field
+    records, so that bodies which are not utf-8 e.g. attachments survive
+
+    Parameters
+    ----------
+    path: str
+        location of the cassette file
+    mode: str
+        'record' or 'replay'
+    """
+    def __init__(self, path, mode):
+        if mode not in ('record', 'replay'):
+            raise ValueError('{} not found.  Must be one of {}'.format(
+                mode, ['record', 'replay']))
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.interactions = collections.defaultdict(collections.deque)
+        if mode == 'record':
+            self.file = gzip.open(path, 'wb')
+        else:
+            self.file = None
+            self._load()
+
+    def _load(self):
+        with gzip.open(self.path, 'rb') as f:
+            for line in f:
+                entry = json.loads(line)
+                key = request_key(entry['method'], entry['url'],
+                                  dict(entry['params']), entry['body'])
+                self.interactions[key].append(entry['response'])
+
+    def record(self, method, url, params, data_str, response):
+        """Append the request and its response to the cassette"""
+        entry = dict(
+            method=method.upper(), url=url,
+            params=sorted((params or {}).items()), body=data_str,
+            response=dict(status_code=response.status_code,
+                          headers=dict(response.headers), encoding='base64',
+                          content=base64.b64encode(response.content)))
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self.lock:
+            self.file.write(line)
+
+    def play(self, method, url, params, data_str):
+        """Return the recorded response for the request
+
+        Returns
+        -------
+        ReplayedResponse
+
+        Raises
+        ------
+        CassetteError
+            if the request was not recorded
+        """
+        key = request_key(method, url, params, data_str)
+        with self.lock:
+            responses = self.interactions.get(key)
+            if not responses:
+                raise CassetteError('No recorded response for {} {}'.format(
+                    key[0], key[1]))
+            response = responses[0] if len(responses) == 1 else \
+                responses.popleft()
+        if response.get('encoding') == 'base64':
+            content = base64.b64decode(response['content'])
+        else:
+            # cassettes recorded before bodies were base64 encoded
+            content = response['content'].encode('utf-8')
+        return ReplayedResponse(response['status_code'], response['headers'],
+                                content)
+
+    def close(self):
+        if self.file is not None:
+            with self.lock:
+                self.file.close()
@@ -0,0 +1,181 @@
+import codecs
+import json
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JSONCodec(object):
+    """Encodes request bodies and decodes responses using the standard
+    library json module
+
+    Parameters
+    ----------
+    default: callable
+        Optional. Defaults to None. called to serialise objects json does not
+        support natively, see json.dumps
+    """
+    name = 'json'
+
+    def __init__(self, default=None):
+        self.default = default
+        self.decoder = json.JSONDecoder()
+
+    def encode(self, obj):
+        return json.dumps(obj, default=self.default)
+
+    def decode(self, text):
+        return json.loads(text)
+
+    def raw_decode(self, text, idx=0):
+        """Decode the json document starting at text[idx], returning it along
+        with the index where it ends"""
+        return self.decoder.raw_decode(text, idx)
+
+
+class SimpleJSONCodec(JSONCodec):
+    """JSONCodec using the C speedups of simplejson.  Named tuples are encoded
+    as arrays like the standard library does, simplejson would otherwise look
+    up _asdict on every object including the API data objects"""
+    name = 'simplejson'
+
+    def __init__(self, default=None):
+        self.default = default
+        self.decoder = simplejson.JSONDecoder()
+
+    def encode(self, obj):
+        return simplejson.dumps(obj, default=self.default,
+                                namedtuple_as_object=False)
+
+    def decode(self, text):
+        return simplejson.loads(text)
+
+
+class UJSONCodec(JSONCodec):
+    """JSONCodec decoding with ujson.  ujson cannot call a default hook for
+    unsupported types so bodies are still encoded with the standard library.
+    Floats are decoded with precise_float so amounts match the other codecs,
+    and documents ujson refuses, such as integers of 2**64 or more, fall back
+    to the standard library, which also decodes streamed pages"""
+    name = 'ujson'
+
+    def decode(self, text):
+        try:
+            return ujson.loads(text, precise_float=True)
+        except ValueError:
+            return json.loads(text)
+
+
+CODECS = dict(json=JSONCodec, simplejson=SimpleJSONCodec, ujson=UJSONCodec)
+_AVAILABLE = dict(json=True, simplejson=simplejson is not None,
+                  ujson=ujson is not None)
+# order in which codecs are tried when none is asked for.  ujson is only used
+# when asked for by name
+_PREFERENCE = ['simplejson', 'json']
+
+
+def get_codec(name=None, default=None):
+    """Return the codec called name, or simplejson if it is installed and json
+    otherwise if name is None or 'auto'
+
+    Parameters
+    ----------
+    name: str
+        Optional. Defaults to None. One of json, simplejson, ujson or auto
+    default: callable
+        Optional. Defaults to None. hook for types json cannot serialise
+
+    Returns
+    -------
+    JSONCodec
+    """
+    if name is None or name == 'auto':
+        name = [n for n in _PREFERENCE if _AVAILABLE[n]][0]
+    if name not in CODECS:
+        raise ValueError('{} not found.  Must be one of {}'.format(
+            name, sorted(CODECS)))
+    if not _AVAILABLE[name]:
+        raise ImportError('{} json codec is not installed'.format(name))
+    return CODECS[name](default)
+
+
+_WHITESPACE = u' \t\n\r'
+
+
+def iter_json_array(chunks, codec=None):
+    """Incrementally decode a json array from an iterable of utf-8 encoded
+    chunks, yielding each element as soon as it has been read.  Only the
+    element being decoded and the unread part of the current chunk are held
+    in memory
+
+    Parameters
+    ----------
+    chunks: iterable(str)
+        the encoded document e.g. response.iter_content(65536)
+    codec: JSONCodec
+        Optional. Defaults to JSONCodec(). used to decode each element
+
+    Returns
+    -------
+    generator
+    """
+    raw_decode = (codec or JSONCodec()).raw_decode
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buf, pos, eof = u'', 0, False
+    # start: expecting '[', first: an element or ']', value: an element,
+    # sep: ',' or ']'
+    state = 'start'
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos == len(buf) or state == 'more':
+            if eof:
+                raise ValueError('Unexpected end of json array')
+            chunk = next(chunks, None)
+            if chunk is None:
+                eof = True
+                buf = buf[pos:] + decoder.decode(b'', True)
+            else:
+                buf = buf[pos:] + decoder.decode(chunk)
+            pos = 0
+            if state == 'more':
+                state = 'value'
+            continue
+        char = buf[pos]
+        if state == 'start':
+            if char != u'[':
+                raise ValueError('Expected a json array')
+            pos += 1
+            state = 'first'
+            continue
+        if char == u']' and state in ('first', 'sep'):
+            return
+        if state == 'sep':
+            if char != u',':
+                raise ValueError('Expected , or ] at position {}'.format(pos))
+            pos += 1
+            state = 'value'
+            continue
+        try:
+            obj, end = raw_decode(buf, pos)
+        except ValueError:
+            # most likely the element continues in the next chunk
+            if eof:
+                raise
+            state = 'more'
+            continue
+        if end == len(buf) and not eof:
+            # a number at the end of the buffer may continue in the next chunk
+            state = 'more'
+            continue
+        yield obj
+        pos = end
+        state = 'sep'
@@ -2,3 +2,96 @@ class Config(object):
     domain = ""
     login = ""
     password = ""
+    scheme = "https"
+
+    # HTTP connection pooling used by API.session.  pool_connections is the
+    # number of per-host pools to cache and pool_maxsize the maximum number of
+    # connections kept alive per host.  When pool_block is True callers wait
+    # for a free connection instead of opening throwaway ones
+    pool_connections = 10
+    pool_maxsize = 10
+    pool_block = False
+    keep_alive = True
+    # seconds, or a (connect, read) tuple, passed to every request
+    timeout = None
+
+    # number of records requested per page by the API.iter_* methods
+    page_size = 100
+    # number of pages fetched concurrently by the API.scan_* methods
+    scan_concurrency = 4
+
+    # retrying of failed requests, see mambu.retry.RetryPolicy.  Only methods
+    # in retry_methods are retried, apart from 429 responses which mambu
+    # refuses without applying
+    retries = 3
+    retry_backoff = 0.5
+    retry_backoff_max = 30.0
+    retry_statuses = (429, 500, 502, 503, 504)
+    retry_methods = ('get', 'delete')
+    # client side limit in requests per second shared by every API talking to
+    # the same domain.  None disables the limit
+    rate_limit = None
+    rate_limit_burst = None
+
+    # opt in cache of slow changing reference data.  cache_maxsize is the
+    # number of responses kept, None disables the cache, and cache_ttls maps
+    # an endpoint to the seconds its GET responses are cached for.  A write
+    # made through the same API to an endpoint invalidates its cached
+    # responses, but API has no methods writing to these endpoints, so
+    # changes made in mambu itself are only seen once the ttl expires
+    cache_maxsize = None
+    cache_ttls = {
+        'loanproducts': 300,
+        'customfields': 300,
+        'customfieldsets': 300,
+    }
+
+    # size of the thread pool shared by the helpers of API that fan requests
+    # out concurrently
+    max_workers = 8
+    # number of requests mambu.async_api.AsyncAPI keeps in flight at once.
+    # The connection pool of its API is grown to hold as many connections
+    async_max_workers = 100
+
+    # each request is logged at DEBUG level on the mambu.api.requests logger.
+    # Request and response bodies are only logged when log_bodies is True and
+    # are truncated to log_body_max characters
+    log_bodies = False
+    log_body_max = 1024
+
+    # json codec used for request and response bodies, one of json,
+    # simplejson, ujson or auto to pick simplejson when it is installed and
+    # json otherwise
+    json_codec = 'auto'
+    # bytes read at a time when decoding paginated responses incrementally
+    stream_chunk_size = 65536
+
+    # if True concurrent identical GET requests are sent to mambu once with
+    # every caller receiving its own copy of the response
+    coalesce_reads = False
+
+    # if True request metrics are recorded in metrics_registry, or in the
+    # shared mambu.metrics.REGISTRY when it is None
+    metrics_enabled = False
+    metrics_registry = None
+
+    # if True loan and savings transactions are retried after checking
+    # whether mambu applied the failed attempt, and those that move money are
+    # tagged with an idempotency key appended to their notes, see
+    # API._post_transaction
+    idempotent_transactions = False
+
+    # opt in circuit breaking.  Requests to a group of endpoints (the top
+    # level endpoint e.g. loans) fail fast for breaker_reset seconds after
+    # breaker_threshold consecutive connection errors or 5xx responses, or the
+    # threshold of the group in breaker_thresholds, before a single probe
+    # request is let through.  None disables circuit breaking
+    breaker_threshold = None
+    breaker_thresholds = {}
+    breaker_reset = 30.0
+
+    # with cassette_mode 'record' every request and response is written to
+    # the cassette file, and with 'replay' requests are answered from it
+    # without touching the network, see mambu.cassette
+    cassette = None
+    cassette_mode = None
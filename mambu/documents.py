@@ -0,0 +1,129 @@
+"""Streaming encoding and decoding of mambu document bodies.  Documents are
+sent and received as json with the content base64 encoded in the
+documentContent field, so these helpers encode from and decode to file
+objects a chunk at a time, keeping memory use independent of document size"""
+import base64
+import binascii
+
+
+CONTENT_FIELD = '"documentContent"'
+
+
+def iter_document_body(document, fileobj, chunk_size, codec):
+    """Generate the json body creating document with the content of fileobj,
+    base64 encoding it a chunk at a time
+
+    Parameters
+    ----------
+    document: dict
+        the document fields e.g. name and documentHolderKey
+    fileobj: file
+        file object open for reading in binary mode
+    chunk_size: int
+        bytes read from fileobj at a time, rounded down to a multiple of 3 so
+        that the chunks encode independently
+    codec: JSONCodec
+        codec encoding the document fields
+
+    Returns
+    -------
+    generator
+    """
+    chunk_size = max(3, chunk_size - chunk_size % 3)
+    yield '{"document": %s, %s: "' % (codec.encode(document), CONTENT_FIELD)
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield base64.b64encode(chunk)
+    yield '"}'
+
+
+class CountingBody(object):
+    """Iterable over the chunks of a request body counting the bytes sent"""
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.sent += len(chunk)
+            yield chunk
+
+
+def write_document_content(chunks, sink, codec):
+    """Decode the json body of a fetched document, writing the base64 decoded
+    documentContent to sink as it is received
+
+    Parameters
+    ----------
+    chunks: iterable
+        the raw response body in chunks
+    sink: file
+        object with a write method receiving the decoded content
+    codec: JSONCodec
+        codec decoding the rest of the body
+
+    Returns
+    -------
+    dict
+        the body without documentContent, or the whole body if it has no
+        documentContent field
+    """
+    head, tail = [], []
+    buf = ''
+    pending = ''
+    state = 'head'
+    for chunk in chunks:
+        buf += chunk
+        if state == 'head':
+            idx = buf.find(CONTENT_FIELD)
+            if idx < 0:
+                keep = len(CONTENT_FIELD) - 1
+                head.append(buf[:-keep])
+                buf = buf[-keep:]
+                continue
+            quote = buf.find('"', idx + len(CONTENT_FIELD))
+            if quote < 0:
+                continue
+            head.append(buf[:quote])
+            buf = buf[quote + 1:]
+            state = 'content'
+        if state == 'content':
+            end = buf.find('"')
+            text = buf if end < 0 else buf[:end]
+            if text.endswith('\\'):
+                # keep an escape split across chunks with the next chunk
+                text = text[:-1]
+            consumed = len(text)
+            text = pending + text.replace('\\/', '/').replace(
+                '\\n', '').replace('\\r', '')
+            usable = len(text) - len(text) % 4
+            if usable:
+                sink.write(_b64decode(text[:usable]))
+            pending = text[usable:]
+            if end < 0:
+                buf = buf[consumed:]
+                continue
+            if pending:
+                sink.write(_b64decode(pending))
+                pending = ''
+            buf = buf[end:]
+            state = 'tail'
+        if state == 'tail':
+            tail.append(buf)
+            buf = ''
+    if state == 'content':
+        raise ValueError('Unterminated documentContent in document body')
+    if state == 'head':
+        return codec.decode(''.join(head) + buf)
+    body = codec.decode(''.join(head) + '"' + ''.join(tail))
+    body.pop('documentContent', None)
+    return body
+
+
+def _b64decode(text):
+    try:
+        return base64.b64decode(text)
+    except (TypeError, binascii.Error):
+        raise ValueError('Invalid base64 in documentContent')
@@ -12,3 +12,25 @@ class MambuAPIException(Exception):
             self.error_source = status['errorSource']
 
         super(MambuAPIException, self).__init__(msg)
+
+
+class MambuBatchException(Exception):
+    """Raised by helpers that fan a call out over several items once every
+    item has been attempted, if any of them failed
+
+    Parameters
+    ----------
+    message: str
+        description of the batch
+    results: list
+        result for every item in input order, None for items that failed
+    errors: dict
+        maps the index of every failed item to the exception it raised
+    """
+    def __init__(self, message, results, errors):
+        self.results = results
+        self.errors = errors
+        msg = '{}, {} of {} failed: {}'.format(
+            message, len(errors), len(results), '; '.join(
+                '{}: {}'.format(n, e) for n, e in sorted(errors.items())))
+        super(MambuBatchException, self).__init__(msg)
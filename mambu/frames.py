@@ -0,0 +1,155 @@
+"""Export of mambu records to typed pandas DataFrames.  Records are consumed
+one at a time, e.g. straight from API.iter_loans, with each field appended to
+a column list, and every column is converted in a single vectorised call once
+the records are exhausted"""
+import collections
+
+import pandas
+
+
+# kinds of column: str columns are kept as objects, float columns hold
+# amounts, datetime columns are parsed to UTC timestamps and category columns
+# hold states and types
+LOAN_COLUMNS = [
+    ('id', 'str'), ('encodedKey', 'str'), ('accountHolderKey', 'str'),
+    ('productTypeKey', 'str'), ('accountState', 'category'),
+    ('accountSubState', 'category'), ('loanAmount', 'float'),
+    ('interestRate', 'float'), ('principalBalance', 'float'),
+    ('principalPaid', 'float'), ('principalDue', 'float'),
+    ('interestBalance', 'float'), ('feesBalance', 'float'),
+    ('feesPaid', 'float'), ('feesDue', 'float'),
+    ('repaymentInstallments', 'float'), ('creationDate', 'datetime'),
+    ('approvedDate', 'datetime'), ('disbursementDate', 'datetime'),
+    ('expectedDisbursementDate', 'datetime'),
+    ('firstRepaymentDate', 'datetime'), ('expectedMaturityDate', 'datetime'),
+    ('closedDate', 'datetime'), ('lastModifiedDate', 'datetime')]
+
+TRANCHE_COLUMNS = [
+    ('encodedKey', 'str'), ('amount', 'float'),
+    ('expectedDisbursementDate', 'datetime'),
+    ('disbursementTransactionKey', 'str')]
+
+TRANSACTION_COLUMNS = [
+    ('transactionId', 'str'), ('encodedKey', 'str'),
+    ('parentAccountKey', 'str'), ('type', 'category'), ('amount', 'float'),
+    ('principalAmount', 'float'), ('interestAmount', 'float'),
+    ('feesAmount', 'float'), ('balance', 'float'),
+    ('creationDate', 'datetime'), ('entryDate', 'datetime'),
+    ('comment', 'str')]
+
+SAVINGS_COLUMNS = [
+    ('id', 'str'), ('encodedKey', 'str'), ('accountHolderKey', 'str'),
+    ('productTypeKey', 'str'), ('accountState', 'category'),
+    ('accountType', 'category'), ('balance', 'float'),
+    ('accruedInterest', 'float'), ('creationDate', 'datetime'),
+    ('approvedDate', 'datetime'), ('activationDate', 'datetime'),
+    ('lastModifiedDate', 'datetime')]
+
+
+def _convert(values, kind):
+    if kind == 'float':
+        return pandas.to_numeric(values, errors='coerce').astype(float)
+    if kind == 'datetime':
+        return pandas.to_datetime(values, utc=True, errors='coerce')
+    if kind == 'category':
+        return pandas.Categorical(values)
+    return values
+
+
+def _frame(columns, data, names=None):
+    names = names or [name for name, _ in columns]
+    return pandas.DataFrame(collections.OrderedDict(
+        (label, _convert(data[name], kind))
+        for label, (name, kind) in zip(names, columns)), columns=names)
+
+
+def to_frame(records, columns):
+    """Build a DataFrame with a row for every record
+
+    Parameters
+    ----------
+    records: iterable(dict)
+        e.g. a generator of records returned by API.iter_loans
+    columns: list(tuple)
+        (field, kind) pairs for the columns of the frame, where kind is one
+        of str, float, datetime or category
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    data = dict((name, []) for name, _ in columns)
+    appenders = [(name, data[name].append) for name, _ in columns]
+    for record in records:
+        get = record.get
+        for name, append in appenders:
+            append(get(name))
+    return _frame(columns, data)
+
+
+def loans_frame(loans, tranches=False):
+    """Build a DataFrame of loans, or of their tranches with the fields of
+    their loan when tranches is True
+
+    Parameters
+    ----------
+    loans: iterable(dict)
+        e.g. the generator returned by API.iter_loans
+    tranches: bool
+        Optional. Defaults to False. If True the frame has a row for every
+        tranche, with columns prefixed tranche_ for the tranche fields and a
+        bool tranche_disbursed column, and loans without tranches are left out
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    if not tranches:
+        return to_frame(loans, LOAN_COLUMNS)
+    data = dict((name, []) for name, _ in LOAN_COLUMNS)
+    tranche_data = dict((name, []) for name, _ in TRANCHE_COLUMNS)
+    for loan in loans:
+        loan_values = [(data[name].append, loan.get(name))
+                       for name, _ in LOAN_COLUMNS]
+        for tranche in loan.get('tranches') or ():
+            for append, value in loan_values:
+                append(value)
+            for name, _ in TRANCHE_COLUMNS:
+                tranche_data[name].append(tranche.get(name))
+    frame = _frame(LOAN_COLUMNS, data)
+    tranche_frame = _frame(TRANCHE_COLUMNS, tranche_data, [
+        'tranche_' + name for name, _ in TRANCHE_COLUMNS])
+    frame = pandas.concat([frame, tranche_frame], axis=1)
+    frame['tranche_disbursed'] = \
+        frame['tranche_disbursementTransactionKey'].notnull()
+    return frame
+
+
+def transactions_frame(transactions):
+    """Build a DataFrame of loan or savings transactions
+
+    Parameters
+    ----------
+    transactions: iterable(dict)
+        e.g. the list returned by API.get_transactions
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    return to_frame(transactions, TRANSACTION_COLUMNS)
+
+
+def savings_frame(savings):
+    """Build a DataFrame of savings accounts
+
+    Parameters
+    ----------
+    savings: iterable(dict)
+        e.g. the generator returned by API.iter_savings
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    return to_frame(savings, SAVINGS_COLUMNS)
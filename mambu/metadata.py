@@ -0,0 +1,143 @@
+"""Metadata describing the fields of mambu entities.  The metadata is kept in
+etc/data.yaml but parsing YAML is slow, so the parsed metadata is cached as a
+pickle, next to the YAML when the package is writable or in the user cache
+directory otherwise.  The pickle is named after a hash of the YAML and the
+version of the package, so a cache built from other metadata or by another
+release is never loaded, and caches left by earlier metadata or releases are
+removed when a new one is written.  Setting MAMBU_CACHE_DIR keeps the pickle
+in that directory instead, e.g. while testing.  Running
+
+    python -m mambu.metadata
+
+compiles the cache ahead of time e.g. when building a package"""
+import cPickle as pickle
+import glob
+import hashlib
+import os
+import tempfile
+
+from version import __version__
+
+
+YAML_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'etc',
+                         'data.yaml')
+
+
+def cache_key():
+    """Return the hash of the YAML metadata and the package version naming
+    the pickled metadata
+
+    Returns
+    -------
+    str
+    """
+    with open(YAML_PATH, 'rb') as f:
+        return hashlib.md5(f.read() + __version__).hexdigest()[:16]
+
+
+def cache_paths(key=None):
+    """Return the locations tried for the pickled metadata, in order
+
+    Parameters
+    ----------
+    key: str
+        Optional. Defaults to cache_key()
+
+    Returns
+    -------
+    list(str)
+    """
+    name = 'data-{}.pickle'.format(key or cache_key())
+    directory = os.environ.get('MAMBU_CACHE_DIR')
+    if directory:
+        return [os.path.join(directory, name)]
+    return [os.path.join(os.path.dirname(YAML_PATH), name),
+            os.path.join(os.path.expanduser('~'), '.cache', 'mambu', name)]
+
+
+def parse_metadata():
+    """Parse the YAML metadata
+
+    Returns
+    -------
+    dict
+    """
+    import yaml
+    with open(YAML_PATH, 'r') as f:
+        return yaml.safe_load(f)
+
+
+def _prune(path):
+    """Remove the pickled metadata next to path built from other metadata or
+    package versions"""
+    pattern = os.path.join(os.path.dirname(path), 'data-*.pickle')
+    for stale in glob.glob(pattern):
+        if stale != path:
+            try:
+                os.unlink(stale)
+            except OSError:
+                pass
+
+
+def _write(path, metadata):
+    """Write the pickled metadata to path atomically, removing stale caches
+    next to it"""
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(metadata, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+    _prune(path)
+
+
+def compile_metadata():
+    """Parse the YAML metadata and cache it in the first writable location
+
+    Returns
+    -------
+    str
+        path of the cache, or None if no location was writable
+    """
+    metadata = parse_metadata()
+    for path in cache_paths(cache_key()):
+        try:
+            _write(path, metadata)
+            return path
+        except (IOError, OSError):
+            continue
+    return None
+
+
+def load_metadata():
+    """Return the metadata from the first cache built from the current YAML
+    and package version, parsing the YAML and caching it when there is none
+
+    Returns
+    -------
+    dict
+    """
+    paths = cache_paths(cache_key())
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            continue
+    metadata = parse_metadata()
+    for path in paths:
+        try:
+            _write(path, metadata)
+            break
+        except (IOError, OSError):
+            continue
+    return metadata
+
+
+if __name__ == '__main__':
+    print compile_metadata()
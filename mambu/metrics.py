@@ -0,0 +1,198 @@
+import threading
+
+
+# path segments naming mambu resources, every other segment of a url is an
+# id and is replaced by {id} when templating
+RESOURCES = frozenset([
+    'clients', 'groups', 'loans', 'savings', 'transactions', 'documents',
+    'custominformation', 'customfields', 'customfieldsets', 'loanproducts',
+    'savingsProducts', 'loanProducts', 'branches', 'centres', 'users',
+    'search'])
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def template_path(url):
+    """Replace the ids in an api url with {id} so that requests to the same
+    endpoint share metrics e.g. 'loans/ABC123/transactions' becomes
+    'loans/{id}/transactions'
+
+    Parameters
+    ----------
+    url: str
+        api url relative to base_url
+
+    Returns
+    -------
+    str
+    """
+    return '/'.join(
+        segment if segment in RESOURCES else '{id}'
+        for segment in url.split('?', 1)[0].split('/'))
+
+
+class Histogram(object):
+    """Cumulative histogram of observations over fixed bucket bounds"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for n, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[n] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Return (bound, count of observations <= bound) pairs including the
+        +Inf bucket"""
+        total, result = 0, []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((repr(bound), total))
+        result.append(('+Inf', self.count))
+        return result
+
+
+class MetricsRegistry(object):
+    """Thread safe in process store of request metrics per method and
+    templated endpoint, rendered by exposition in the Prometheus text format
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+            self.latency = {}
+            self.bytes_sent = {}
+            self.bytes_received = {}
+            self.retries = {}
+            self.gauges = {}
+
+    def observe_request(self, method, url, status_code, duration, sent,
+                        received):
+        """Record one request attempt
+
+        Parameters
+        ----------
+        method: str
+            http method of the request
+        url: str
+            api url relative to base_url
+        status_code: int
+            status of the response or None if none was received
+        duration: float
+            seconds taken by the attempt
+        sent: int
+            bytes in the request body
+        received: int
+            bytes in the response body
+        """
+        key = (method.upper(), template_path(url))
+        status = 'error' if status_code is None else str(status_code)
+        with self.lock:
+            self.requests[key + (status,)] = self.requests.get(
+                key + (status,), 0) + 1
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram()
+            histogram.observe(duration)
+            self.bytes_sent[key] = self.bytes_sent.get(key, 0) + sent
+            self.bytes_received[key] = self.bytes_received.get(
+                key, 0) + received
+
+    def observe_received(self, method, url, received):
+        """Add the bytes of a response body read after its request was
+        recorded, e.g. a streamed page
+
+        Parameters
+        ----------
+        method: str
+            http method of the request
+        url: str
+            api url relative to base_url
+        received: int
+            bytes read from the response body
+        """
+        key = (method.upper(), template_path(url))
+        with self.lock:
+            self.bytes_received[key] = self.bytes_received.get(
+                key, 0) + received
+
+    def observe_retry(self, method, url):
+        key = (method.upper(), template_path(url))
+        with self.lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def set_gauge(self, name, labels, value):
+        """Set the gauge called name with the labels given as a tuple of
+        (label, value) pairs"""
+        with self.lock:
+            self.gauges[(name, labels)] = value
+
+    def exposition(self):
+        """Render every metric in the Prometheus text exposition format
+
+        Returns
+        -------
+        str
+        """
+        lines = []
+        with self.lock:
+            _counter(lines, 'mambu_requests_total',
+                     'Requests sent to mambu by status', ('method', 'endpoint',
+                                                          'status'),
+                     self.requests)
+            lines.append('# HELP mambu_request_duration_seconds Latency of '
+                         'requests sent to mambu')
+            lines.append('# TYPE mambu_request_duration_seconds histogram')
+            for key, histogram in sorted(self.latency.items()):
+                labels = _labels(('method', 'endpoint'), key)
+                for bound, count in histogram.cumulative():
+                    lines.append(
+                        'mambu_request_duration_seconds_bucket{%s,le="%s"} %d'
+                        % (labels, bound, count))
+                lines.append('mambu_request_duration_seconds_sum{%s} %r'
+                             % (labels, histogram.sum))
+                lines.append('mambu_request_duration_seconds_count{%s} %d'
+                             % (labels, histogram.count))
+            _counter(lines, 'mambu_request_bytes_total',
+                     'Bytes of request bodies sent to mambu',
+                     ('method', 'endpoint'), self.bytes_sent)
+            _counter(lines, 'mambu_response_bytes_total',
+                     'Bytes of response bodies received from mambu',
+                     ('method', 'endpoint'), self.bytes_received)
+            _counter(lines, 'mambu_retries_total',
+                     'Requests to mambu that were retried',
+                     ('method', 'endpoint'), self.retries)
+            names = sorted(set(name for name, _ in self.gauges))
+            for name in names:
+                lines.append('# TYPE %s gauge' % name)
+                for (_name, labels), value in sorted(self.gauges.items()):
+                    if _name == name:
+                        lines.append('%s{%s} %r' % (name, _labels(
+                            [k for k, _ in labels], [v for _, v in labels]),
+                            value))
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(names, values):
+    return ','.join('%s="%s"' % (name, str(value).replace('"', '\\"'))
+                    for name, value in zip(names, values))
+
+
+def _counter(lines, name, description, label_names, values):
+    lines.append('# HELP %s %s' % (name, description))
+    lines.append('# TYPE %s counter' % name)
+    for key, value in sorted(values.items()):
+        lines.append('%s{%s} %d' % (name, _labels(label_names, key), value))
+
+
+# registry used by every API unless its config sets metrics_registry
+REGISTRY = MetricsRegistry()
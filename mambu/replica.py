@@ -0,0 +1,341 @@
+"""Local SQLite replica of the loans, tranches, clients and savings of a mambu
+tenant.  The replica is brought up to date by sync, which only requests the
+records modified since the last checkpoint, and answers the due date queries
+of API from local indexes"""
+import datetime
+import itertools
+import sqlite3
+import threading
+
+from tools import datelib
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS loans (
+    encoded_key TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    account_holder_key TEXT,
+    account_state TEXT,
+    loan_amount REAL,
+    expected_disbursement_date TEXT,
+    first_repayment_date TEXT,
+    expected_maturity_date TEXT,
+    last_modified_date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS loans_id ON loans (id);
+CREATE INDEX IF NOT EXISTS loans_holder ON loans (account_holder_key);
+CREATE INDEX IF NOT EXISTS loans_state ON loans (account_state);
+CREATE INDEX IF NOT EXISTS loans_first_repayment
+    ON loans (first_repayment_date);
+CREATE INDEX IF NOT EXISTS loans_maturity ON loans (expected_maturity_date);
+
+CREATE TABLE IF NOT EXISTS tranches (
+    encoded_key TEXT PRIMARY KEY,
+    loan_key TEXT NOT NULL,
+    amount REAL,
+    expected_disbursement_date TEXT,
+    disbursed INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tranches_loan ON tranches (loan_key);
+CREATE INDEX IF NOT EXISTS tranches_pending
+    ON tranches (disbursed, expected_disbursement_date);
+
+CREATE TABLE IF NOT EXISTS clients (
+    encoded_key TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    state TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    last_modified_date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clients_id ON clients (id);
+
+CREATE TABLE IF NOT EXISTS savings (
+    encoded_key TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    account_holder_key TEXT,
+    account_state TEXT,
+    balance REAL,
+    last_modified_date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS savings_id ON savings (id);
+CREATE INDEX IF NOT EXISTS savings_holder ON savings (account_holder_key);
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    entity TEXT PRIMARY KEY,
+    last_modified_date TEXT NOT NULL,
+    synced_at TEXT NOT NULL
+);
+"""
+
+ENTITIES = ('loans', 'clients', 'savings')
+
+# records received from mambu before they are written to the replica
+SYNC_BATCH_SIZE = 500
+
+
+def _day(value):
+    return None if not value else datelib.mambu_day(value)
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+class Replica(object):
+    """SQLite replica of a mambu tenant kept current by incremental sync
+
+    Parameters
+    ----------
+    api: API
+        the api the replica is synced from
+    path: str
+        Optional. Defaults to ':memory:'. file holding the replica so that it
+        and its checkpoints persist between processes
+    """
+    def __init__(self, api, path=':memory:'):
+        self.api = api
+        self.codec = api.codec
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def checkpoint(self, entity):
+        """Return the latest lastModifiedDate synced for entity, or None if
+        it has never been synced"""
+        with self.lock:
+            row = self.db.execute(
+                'SELECT last_modified_date FROM checkpoints WHERE entity = ?',
+                (entity,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, full=False, entities=ENTITIES):
+        """Bring the replica up to date with mambu.  Each entity is requested
+        in full the first time it is synced, or when full is True, and after
+        that only records modified on or after the day of its checkpoint are
+        requested.  Records deleted in mambu are only removed by a full sync
+
+        Parameters
+        ----------
+        full: bool
+            Optional. Defaults to False. If True every record is requested
+            and records no longer in mambu are dropped
+        entities: iterable(str)
+            Optional. Defaults to loans, clients and savings
+
+        Returns
+        -------
+        dict
+            maps each entity to the number of records received
+        """
+        counts = {}
+        for entity in entities:
+            if entity not in ENTITIES:
+                raise Exception('{} not found.  Must be one of {}'.format(
+                    entity, ENTITIES))
+            checkpoint = None if full else self.checkpoint(entity)
+            if checkpoint is None:
+                records = getattr(self.api, 'iter_' + entity)()
+            else:
+                # mambu compares modification dates by day only, so search
+                # from the day before the checkpoint and let upserts absorb
+                # the overlap
+                after = datelib.coerce_date(_day(checkpoint)) - \
+                    datetime.timedelta(days=1)
+                records = self.api.iter_search([dict(
+                    filterSelection='LAST_MODIFIED_DATE',
+                    filterElement='AFTER',
+                    value=datelib.mambu_date(after))], entity)
+            counts[entity] = self._store(
+                entity, records, checkpoint, replace=checkpoint is None)
+        return counts
+
+    def _store(self, entity, records, checkpoint, replace):
+        """Write records to the table of entity and advance its checkpoint.
+        Records are received in batches of SYNC_BATCH_SIZE without holding
+        the lock, and each batch is written in its own short transaction so
+        that queries are answered while mambu is being read.  When replace
+        is True the rows of records that were not received are dropped in
+        the final transaction, which also advances the checkpoint"""
+        upsert = getattr(self, '_upsert_' + entity)
+        synced = 'synced_' + entity
+        latest = checkpoint or ''
+        count = 0
+        if replace:
+            with self.lock:
+                with self.db:
+                    self.db.execute(
+                        'CREATE TEMP TABLE IF NOT EXISTS {} '
+                        '(encoded_key TEXT PRIMARY KEY)'.format(synced))
+                    self.db.execute('DELETE FROM {}'.format(synced))
+        records = iter(records)
+        while True:
+            batch = list(itertools.islice(records, SYNC_BATCH_SIZE))
+            if not batch:
+                break
+            with self.lock:
+                with self.db:
+                    for record in batch:
+                        upsert(record)
+                    if replace:
+                        self.db.executemany(
+                            'INSERT OR IGNORE INTO {} VALUES (?)'.format(
+                                synced),
+                            [(record['encodedKey'],) for record in batch])
+            for record in batch:
+                latest = max(latest, record.get('lastModifiedDate') or '')
+            count += len(batch)
+        with self.lock:
+            with self.db:
+                if replace:
+                    self.db.execute(
+                        'DELETE FROM {} WHERE encoded_key NOT IN '
+                        '(SELECT encoded_key FROM {})'.format(entity, synced))
+                    if entity == 'loans':
+                        self.db.execute(
+                            'DELETE FROM tranches WHERE loan_key NOT IN '
+                            '(SELECT encoded_key FROM loans)')
+                    self.db.execute('DELETE FROM {}'.format(synced))
+                if latest:
+                    self.db.execute(
+                        'INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)',
+                        (entity, latest,
+                         datetime.datetime.utcnow().isoformat()))
+        return count
+
+    def _upsert_loans(self, loan):
+        self.db.execute(
+            'INSERT OR REPLACE INTO loans VALUES '
+            '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (loan['encodedKey'], loan['id'], loan.get('accountHolderKey'),
+             loan.get('accountState'), _float(loan.get('loanAmount')),
+             _day(loan.get('expectedDisbursementDate')),
+             _day(loan.get('firstRepaymentDate')),
+             _day(loan.get('expectedMaturityDate')),
+             loan.get('lastModifiedDate'), self.codec.encode(loan)))
+        self.db.execute('DELETE FROM tranches WHERE loan_key = ?',
+                        (loan['encodedKey'],))
+        self.db.executemany(
+            'INSERT OR REPLACE INTO tranches VALUES (?, ?, ?, ?, ?, ?)',
+            [(t['encodedKey'], loan['encodedKey'], _float(t.get('amount')),
+              _day(t.get('expectedDisbursementDate')),
+              int('disbursementTransactionKey' in t), self.codec.encode(t))
+             for t in loan.get('tranches') or ()])
+
+    def _upsert_clients(self, client):
+        self.db.execute(
+            'INSERT OR REPLACE INTO clients VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (client['encodedKey'], client['id'], client.get('state'),
+             client.get('firstName'), client.get('lastName'),
+             client.get('lastModifiedDate'), self.codec.encode(client)))
+
+    def _upsert_savings(self, account):
+        self.db.execute(
+            'INSERT OR REPLACE INTO savings VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (account['encodedKey'], account['id'],
+             account.get('accountHolderKey'), account.get('accountState'),
+             _float(account.get('balance')), account.get('lastModifiedDate'),
+             self.codec.encode(account)))
+
+    def _query(self, sql, args=()):
+        with self.lock:
+            rows = self.db.execute(sql, args).fetchall()
+        return [self.codec.decode(row[0]) for row in rows]
+
+    def _get(self, entity, entity_id):
+        records = self._query(
+            'SELECT data FROM {} WHERE id = ? OR encoded_key = ?'.format(
+                entity),
+            (entity_id, entity_id))
+        return records[0] if records else None
+
+    def get_loan(self, loan_id):
+        """Return the replicated loan with id or encodedKey loan_id, or None"""
+        return self._get('loans', loan_id)
+
+    def get_client(self, client_id):
+        """Return the replicated client with id or encodedKey client_id, or
+        None"""
+        return self._get('clients', client_id)
+
+    def get_savings(self, savings_id):
+        """Return the replicated savings account with id or encodedKey
+        savings_id, or None"""
+        return self._get('savings', savings_id)
+
+    def get_loans(self, account_state=None, account_holder_key=None):
+        """Return the replicated loans, optionally only those in account_state
+        or held by account_holder_key
+
+        Returns
+        -------
+        list(dict)
+        """
+        clauses, args = [], []
+        if account_state is not None:
+            clauses.append('account_state = ?')
+            args.append(account_state)
+        if account_holder_key is not None:
+            clauses.append('account_holder_key = ?')
+            args.append(account_holder_key)
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        return self._query('SELECT data FROM loans' + where, args)
+
+    def get_principals_due_on_date(self, datestr):
+        """Return the loans with expectedMaturityDate on datestr, see
+        API.get_principals_due_on_date"""
+        return self._query(
+            'SELECT data FROM loans WHERE expected_maturity_date = ?',
+            (datelib.mambu_date(datestr),))
+
+    def get_repayments_due_on_date(self, datestr):
+        """Return the loans with firstRepaymentDate on datestr, see
+        API.get_repayments_due_on_date"""
+        return self._query(
+            'SELECT data FROM loans WHERE first_repayment_date = ?',
+            (datelib.mambu_date(datestr),))
+
+    def get_disbursements_due_on_date(self, datestr):
+        """Return the tranches of APPROVED and ACTIVE loans due to be
+        disbursed on datestr in the form returned by
+        API.get_disbursements_due_on_date.  Loans with more than one tranche
+        pending on the date are left out
+
+        Returns
+        -------
+        list(dict)
+        """
+        with self.lock:
+            rows = self.db.execute(
+                """SELECT t.data, l.encoded_key, l.account_holder_key, l.id
+                FROM tranches t JOIN loans l ON t.loan_key = l.encoded_key
+                WHERE t.disbursed = 0 AND t.expected_disbursement_date = ?
+                AND l.account_state IN ('APPROVED', 'ACTIVE')
+                AND (SELECT COUNT(*) FROM tranches o
+                     WHERE o.loan_key = t.loan_key AND o.disbursed = 0
+                     AND o.expected_disbursement_date =
+                         t.expected_disbursement_date) = 1
+                ORDER BY l.rowid""",
+                (datelib.mambu_date(datestr),)).fetchall()
+        result = []
+        for data, loan_key, holder_key, loan_id in rows:
+            tranche = self.codec.decode(data)
+            result.append(dict(
+                trancheEncodedKey=tranche['encodedKey'],
+                amount=float(tranche['amount']), loanEncodedKey=loan_key,
+                accountHolderKey=holder_key, loanId=loan_id,
+                expectedDisbursementDate=tranche['expectedDisbursementDate']))
+        return result
@@ -0,0 +1,226 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy(object):
+    """Decides whether and when a failed request should be attempted again.
+    Delays grow exponentially from backoff up to backoff_max with full jitter
+    so that many workers failing together do not retry in lock step.  A
+    Retry-After header sent by mambu takes precedence, capped at
+    backoff_max so that a bad header cannot stall a worker indefinitely
+
+    Parameters
+    ----------
+    retries: int
+        maximum number of retries after the first attempt
+    backoff: float
+        base delay in seconds
+    backoff_max: float
+        upper bound in seconds of the delay before jitter is applied, and
+        of the delay asked for by a Retry-After header
+    statuses: iterable(int)
+        http status codes that are worth retrying
+    methods: iterable(str)
+        http methods considered idempotent and so retried by default
+    """
+    def __init__(self, retries=3, backoff=0.5, backoff_max=30.0,
+                 statuses=(429, 500, 502, 503, 504),
+                 methods=('get', 'delete')):
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+
+    @classmethod
+    def from_config(cls, setting):
+        """Build the policy from the retry_* settings of a config
+
+        Parameters
+        ----------
+        setting: callable
+            returns the config value for a setting name e.g. API._setting
+
+        Returns
+        -------
+        RetryPolicy
+        """
+        return cls(retries=setting('retries'),
+                   backoff=setting('retry_backoff'),
+                   backoff_max=setting('retry_backoff_max'),
+                   statuses=setting('retry_statuses'),
+                   methods=setting('retry_methods'))
+
+    def is_idempotent(self, method):
+        return method.lower() in self.methods
+
+    def should_retry(self, attempt, status_code=None, idempotent=True):
+        """Return True if another attempt should be made after the attempt
+        numbered attempt (starting at 0) failed
+
+        Parameters
+        ----------
+        attempt: int
+            number of the attempt that failed, starting at 0
+        status_code: int
+            Optional. Defaults to None. status of the failed response or None
+            if the request failed with a connection error or timeout
+        idempotent: bool
+            Optional. Defaults to True. Whether the request can safely be sent
+            twice.  429 responses are retried regardless since mambu refuses
+            them without applying them
+
+        Returns
+        -------
+        bool
+        """
+        if attempt >= self.retries:
+            return False
+        if status_code == 429:
+            return True
+        return idempotent and (
+            status_code is None or status_code in self.statuses)
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before the next attempt
+
+        Parameters
+        ----------
+        attempt: int
+            number of the attempt that failed, starting at 0
+        retry_after: str
+            Optional. Defaults to None. value of the Retry-After header
+
+        Returns
+        -------
+        float
+        """
+        wait = parse_retry_after(retry_after)
+        if wait is not None:
+            return min(self.backoff_max, wait)
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+
+def parse_retry_after(value, now=None):
+    """Parse a Retry-After header given either as a number of seconds or as
+    an http date
+
+    Returns
+    -------
+    float, None
+        seconds to wait, or None if value is missing or not understood
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, email.utils.mktime_tz(parsed) - now)
+
+
+def _capacity(rate, burst):
+    return float(burst if burst is not None else max(rate, 1))
+
+
+class TokenBucket(object):
+    """Thread safe token bucket used to keep the request rate to a tenant
+    under rate requests per second while allowing bursts of up to burst
+    requests
+
+    Parameters
+    ----------
+    rate: float
+        tokens added per second
+    burst: int
+        Optional. Defaults to rate. capacity of the bucket
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = _capacity(rate, burst)
+        self.tokens = self.capacity
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            with self.lock:
+                self._refill(time.time())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalise(self, seconds):
+        """Empty the bucket and hold off refilling it for seconds, used when
+        mambu reports that the rate limit has been exceeded so that every
+        thread backs off rather than only the one that was refused"""
+        with self.lock:
+            self.tokens = 0.0
+            self.updated = max(self.updated, time.time() + seconds)
+
+    def configure(self, rate, burst=None):
+        """Change the rate and capacity of the bucket in place, keeping the
+        tokens already taken from it"""
+        capacity = _capacity(rate, burst)
+        with self.lock:
+            self._refill(time.time())
+            self.rate = float(rate)
+            self.capacity = capacity
+            self.tokens = min(self.tokens, capacity)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def tenant_rate_limiter(tenant, rate, burst=None):
+    """Return the TokenBucket shared by every API talking to tenant, creating
+    it on first use.  When it is asked for with a different rate or burst the
+    shared bucket is kept, so that requests already waiting on it are still
+    limited, and its rate and burst are updated in place
+
+    Parameters
+    ----------
+    tenant: str
+        mambu domain of the tenant
+    rate: float
+        requests per second allowed to the tenant
+    burst: int
+        Optional. Defaults to None. See TokenBucket
+
+    Returns
+    -------
+    TokenBucket
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(tenant)
+        if bucket is None:
+            bucket = _buckets[tenant] = TokenBucket(rate, burst)
+            return bucket
+    capacity = _capacity(rate, burst)
+    if (bucket.rate, bucket.capacity) != (float(rate), capacity):
+        logger.warning(
+            'Rate limit of %s changed from %s/s (burst %s) to %s/s (burst %s)',
+            tenant, bucket.rate, bucket.capacity, float(rate), capacity)
+        bucket.configure(rate, burst)
+    return bucket
@@ -0,0 +1,67 @@
+import copy
+import sys
+import threading
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.followers = 0
+        self.shared = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """Coalesces concurrent calls made with the same key so that only the
+    first caller, the leader, does the work while callers arriving before it
+    finishes wait and receive their own copy of its result or exception
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Return fn(), sharing the call with any concurrent caller using key
+
+        Parameters
+        ----------
+        key: hashable
+            identifies calls that are interchangeable
+        fn: callable
+            the work to do if no identical call is in flight
+
+        Returns
+        -------
+        object
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = _Call()
+                leader = True
+            else:
+                call.followers += 1
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            call.event.wait()
+            if call.exc_info is not None:
+                raise call.exc_info[0], call.exc_info[1], call.exc_info[2]
+            return copy.deepcopy(call.shared)
+        result = None
+        try:
+            result = fn()
+        except BaseException:
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+                followers = call.followers
+            if followers and call.exc_info is None:
+                # followers copy from a snapshot the leader's caller never sees
+                # so the result can be mutated freely once returned
+                call.shared = copy.deepcopy(result)
+            call.event.set()
+        return result
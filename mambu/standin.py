@@ -0,0 +1,928 @@
+"""Local stand-in for the parts of the mambu api used by mambu.api.API
+
+The stand-in keeps a tenant in memory and serves clients, loans with
+tranches and the loan transaction state machine, savings, documents, loan
+products, custom fields and searches over plain http.  Latency, server errors
+and 429 responses can be injected to exercise the retry, rate limiting and
+throughput features of the client without a live sandbox
+
+    with StandInMambu(latency=0.02, throttle_rate=0.05) as standin:
+        api = API(standin.config())
+
+or from the command line
+
+    python -m mambu.standin --port 8080 --latency 0.05
+"""
+import BaseHTTPServer
+import SocketServer
+import argparse
+import base64
+import collections
+import datetime
+import decimal
+import json
+import logging
+import random
+import re
+import string
+import threading
+import time
+import urlparse
+import uuid
+
+from config import Config
+
+
+logger = logging.getLogger(__name__)
+
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S+0000'
+
+LOAN_PRODUCTS = [
+    dict(id='salary_advance', encodedKey='8a1a2fbd4f1c1730014f27fa48602746',
+         productName='Salary Advance', loanProductType='FIXED_TERM_LOAN'),
+    dict(id='tranched_loan', encodedKey='8ae6317d50ffbb2a0151205728535505',
+         productName='Tranched Loan', loanProductType='FIXED_TERM_LOAN'),
+]
+
+CUSTOM_FIELDS = [
+    dict(id='c_marital_status', name='Marital Status', type='CLIENT_INFO',
+         dataType='STRING', encodedKey='8a1a2fbd4f1c1730014f27fa48600001'),
+    dict(id='l_advance_cycle', name='Advance Cycle',
+         type='LOAN_ACCOUNT_INFO', dataType='STRING',
+         encodedKey='8a1a2fbd4f1c1730014f27fa48600002'),
+]
+
+# filterSelection values whose entity field is not the camel cased name
+FILTER_FIELDS = dict(
+    ACCOUNT_ID='id', CLIENT_ID='id', PRODUCT_KEY='productTypeKey',
+    ACCOUNT_HOLDER_ID='accountHolderKey', CLIENT_STATE='state')
+
+
+class StandInError(Exception):
+    """Raised while handling a request to return an error response"""
+    def __init__(self, status_code, return_code, return_status):
+        super(StandInError, self).__init__(return_status)
+        self.status_code = status_code
+        self.body = dict(returnCode=return_code, returnStatus=return_status)
+
+
+def _now():
+    return datetime.datetime.utcnow().strftime(DATETIME_FORMAT)
+
+
+def _key():
+    return uuid.uuid4().hex
+
+
+def _decimal(value):
+    try:
+        return decimal.Decimal(str(value))
+    except decimal.InvalidOperation:
+        raise StandInError(400, 4, 'INVALID_AMOUNT')
+
+
+def _amount(value):
+    """Format a decimal as mambu does e.g. '400' or '10.5'"""
+    text = '{:f}'.format(value)
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return text
+
+
+def _camel(selection):
+    first, rest = selection.lower().split('_', 1) if '_' in selection else (
+        selection.lower(), '')
+    return first + ''.join(part.title() for part in rest.split('_') if part)
+
+
+def _comparable(value):
+    """Return value as a Decimal, a yyyy-mm-dd string for dates, or a lower
+    case string so that filter values and field values compare sensibly"""
+    if value is None:
+        return None
+    try:
+        return decimal.Decimal(str(value))
+    except decimal.InvalidOperation:
+        pass
+    value = unicode(value)
+    if re.match(r'^\d{4}-\d{2}-\d{2}', value):
+        return value[:10]
+    return value.lower()
+
+
+def _matches(record, constraint):
+    selection = constraint.get('filterSelection', '')
+    element = constraint.get('filterElement', 'EQUALS')
+    field = FILTER_FIELDS.get(selection, _camel(selection))
+    actual = _comparable(record.get(field))
+    value = _comparable(constraint.get('value'))
+    if element == 'EMPTY':
+        return actual is None
+    if element == 'NOT_EMPTY':
+        return actual is not None
+    if element == 'IN':
+        return actual in [_comparable(v) for v in constraint.get('values', [])]
+    if element == 'TODAY':
+        return actual == datetime.datetime.utcnow().strftime('%Y-%m-%d')
+    if actual is None:
+        return False
+    if element in ('EQUALS', 'EQUALS_CASE_SENSITIVE', 'ON'):
+        return actual == value
+    if element == 'STARTS_WITH':
+        return unicode(actual).startswith(unicode(value))
+    if element in ('MORE_THAN', 'AFTER'):
+        return actual > value
+    if element in ('LESS_THAN', 'BEFORE'):
+        return actual < value
+    if element in ('BEFORE_INCLUSIVE',):
+        return actual <= value
+    if element in ('BETWEEN', 'BETWEEN_INCLUSIVE'):
+        return value <= actual <= _comparable(constraint.get('secondValue'))
+    raise StandInError(400, 4, 'INVALID_FILTER_ELEMENT')
+
+
+class MambuState(object):
+    """In memory tenant holding every entity served by the stand-in.  All
+    access goes through handle which serialises requests with a lock"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.collections = dict(
+            clients=collections.OrderedDict(), loans=collections.OrderedDict(),
+            savings=collections.OrderedDict(),
+            documents=collections.OrderedDict(),
+            loanproducts=collections.OrderedDict(
+                (p['id'], dict(p)) for p in LOAN_PRODUCTS),
+            customfields=collections.OrderedDict(
+                (f['id'], dict(f)) for f in CUSTOM_FIELDS))
+        self.custom_values = {}
+        self.client_details = {}
+        self.transactions = collections.defaultdict(list)
+        self.contents = {}
+        self.sequence = 0
+
+    def _next_id(self, numeric=False):
+        self.sequence += 1
+        if numeric:
+            return str(100000000 + self.sequence)
+        return ''.join(random.choice(string.ascii_uppercase)
+                       for _ in range(3)) + str(100 + self.sequence)
+
+    def _find(self, collection, entity_id):
+        records = self.collections[collection]
+        record = records.get(entity_id)
+        if record is None:
+            for candidate in records.itervalues():
+                if candidate.get('encodedKey') == entity_id:
+                    return candidate
+            raise StandInError(404, 100 + len(collection),
+                               'INVALID_{}_ID'.format(collection.upper()))
+        return record
+
+    def _page(self, records, params):
+        offset = int(params.get('offset', 0))
+        limit = min(int(params.get('limit', 50)), 1000)
+        return list(records)[offset:offset + limit]
+
+    def _filter(self, records, params, fields):
+        for name in fields:
+            if name in params:
+                records = [r for r in records if unicode(r.get(name)) ==
+                           unicode(params[name])]
+        return records
+
+    def _object(self, body, name):
+        """Return the json object body[name], or an empty dict if it is not
+        given"""
+        value = body.get(name) or {}
+        if not isinstance(value, dict):
+            raise StandInError(400, 4, 'INVALID_PARAMETERS')
+        return value
+
+    def _strings(self, body, *names):
+        """Check that the fields names of body are strings when given"""
+        for name in names:
+            if body.get(name) is not None and not isinstance(
+                    body[name], basestring):
+                raise StandInError(400, 4, 'INVALID_PARAMETERS')
+
+    def _custom_values(self, body):
+        """Return the (customFieldID, value) pairs of the customInformation in
+        body, checking that every field exists before anything is changed"""
+        fields = body.get('customInformation') or []
+        if not isinstance(fields, list):
+            raise StandInError(400, 4, 'INVALID_PARAMETERS')
+        values = []
+        for field in fields:
+            field_id = field.get('customFieldID') if isinstance(
+                field, dict) else None
+            if not isinstance(field_id, basestring):
+                raise StandInError(400, 603, 'INVALID_CUSTOM_FIELD_ID')
+            self._find('customfields', field_id)
+            values.append((field_id, field.get('value')))
+        return values
+
+    def handle(self, method, segments, params, body):
+        """Return the (status code, response body) for a request
+
+        Parameters
+        ----------
+        method: str
+            upper case http method
+        segments: list(str)
+            path of the request split on / after /api/
+        params: dict
+            query parameters
+        body: object
+            decoded json request body
+        """
+        if body is not None and not isinstance(body, dict):
+            raise StandInError(400, 4, 'INVALID_JSON')
+        with self.lock:
+            resource = segments[0] if segments else ''
+            handler = getattr(self, '_{}_{}'.format(
+                method.lower(), resource.lower()), None)
+            if handler is None:
+                raise StandInError(404, 1, 'INVALID_API_OPERATION')
+            return handler(segments[1:], params, body or {})
+
+    # clients
+
+    def _get_clients(self, rest, params, body):
+        if not rest:
+            records = self._filter(
+                self.collections['clients'].values(), params,
+                ['firstName', 'lastName', 'birthDate', 'state',
+                 'branchId', 'centreId'])
+            return 200, self._page(records, params)
+        client = self._find('clients', rest[0])
+        if len(rest) > 1 and rest[1] == 'loans':
+            return 200, self._page(
+                [l for l in self.collections['loans'].values()
+                 if l['accountHolderKey'] == client['encodedKey']], params)
+        if len(rest) > 1 and rest[1] == 'documents':
+            return 200, self._documents_for(client['encodedKey'])
+        if params.get('fullDetails') in ('true', 'True'):
+            return 200, self._client_details(client)
+        return 200, client
+
+    def _client_details(self, client):
+        details = dict(self.client_details.get(client['encodedKey'], {}))
+        details.setdefault('addresses', [])
+        details.setdefault('idDocuments', [])
+        return dict(
+            details, client=client,
+            customInformation=self._custom_information(client['encodedKey']))
+
+    def _post_clients(self, rest, params, body):
+        if rest and rest[0] == 'search':
+            return 200, self._search('clients', params, body)
+        fields = self._object(body, 'client')
+        custom_values = self._custom_values(body)
+        if rest:
+            client = self._find('clients', rest[0])
+            status_code = 200
+        else:
+            for name in ('firstName', 'lastName'):
+                if not fields.get(name):
+                    raise StandInError(400, 301, 'INVALID_' + name.upper())
+            client = dict(id=self._next_id(numeric=True), encodedKey=_key(),
+                          state='INACTIVE', creationDate=_now(),
+                          approvedDate=_now())
+            self.collections['clients'][client['id']] = client
+            status_code = 201
+        client.update((k, v) for k, v in fields.items()
+                      if k not in ('id', 'encodedKey'))
+        client['lastModifiedDate'] = _now()
+        for name in ('addresses', 'idDocuments'):
+            if body.get(name) is not None:
+                self.client_details.setdefault(
+                    client['encodedKey'], {})[name] = body[name]
+        for field_id, value in custom_values:
+            self._set_custom_value(client['encodedKey'], field_id, value)
+        return status_code, self._client_details(client)
+
+    def _patch_clients(self, rest, params, body):
+        client = self._find('clients', rest[0])
+        return self._patch_custom_field(client, rest, body)
+
+    def _delete_clients(self, rest, params, body):
+        client = self._find('clients', rest[0])
+        return self._delete_custom_field(client, rest)
+
+    # custom fields
+
+    def _custom_information(self, owner_key):
+        return [dict(customFieldID=field_id, value=value)
+                for field_id, value in sorted(
+                    self.custom_values.get(owner_key, {}).items())]
+
+    def _set_custom_value(self, owner_key, field_id, value):
+        self._find('customfields', field_id)
+        self.custom_values.setdefault(owner_key, {})[field_id] = value
+
+    def _patch_custom_field(self, record, rest, body):
+        if len(rest) < 3 or rest[1] != 'custominformation':
+            raise StandInError(404, 1, 'INVALID_API_OPERATION')
+        self._set_custom_value(record['encodedKey'], rest[2],
+                               body.get('value'))
+        record['lastModifiedDate'] = _now()
+        return 200, dict(returnCode=0, returnStatus='SUCCESS')
+
+    def _delete_custom_field(self, record, rest):
+        if len(rest) < 3 or rest[1] != 'custominformation':
+            raise StandInError(404, 1, 'INVALID_API_OPERATION')
+        values = self.custom_values.get(record['encodedKey'], {})
+        if values.pop(rest[2], None) is None:
+            raise StandInError(400, 603, 'INVALID_CUSTOM_FIELD_ID')
+        record['lastModifiedDate'] = _now()
+        return 200, dict(returnCode=0, returnStatus='SUCCESS')
+
+    def _get_customfields(self, rest, params, body):
+        if not rest:
+            return 200, self.collections['customfields'].values()
+        return 200, self._find('customfields', rest[0])
+
+    def _get_customfieldsets(self, rest, params, body):
+        sets = collections.OrderedDict()
+        for field in self.collections['customfields'].values():
+            if params.get('type') in (None, field['type']):
+                sets.setdefault(field['type'], dict(
+                    id='_' + field['type'].lower(), type=field['type'],
+                    name=field['type'].title(), customFields=[]))
+                sets[field['type']]['customFields'].append(field)
+        return 200, sets.values()
+
+    def _get_loanproducts(self, rest, params, body):
+        if not rest:
+            return 200, self.collections['loanproducts'].values()
+        product = self._find('loanproducts', rest[0])
+        if len(rest) > 1 and rest[1] == 'documents':
+            return 200, self._documents_for(product['encodedKey'])
+        return 200, product
+
+    # loans
+
+    def _get_loans(self, rest, params, body):
+        if not rest:
+            records = self._filter(
+                self.collections['loans'].values(), params,
+                ['accountState', 'branchId', 'centreId'])
+            return 200, self._page(records, params)
+        loan = self._find('loans', rest[0])
+        if len(rest) > 1 and rest[1] == 'transactions':
+            return 200, self._page(
+                reversed(self.transactions[loan['encodedKey']]), params)
+        if len(rest) > 1 and rest[1] == 'documents':
+            return 200, self._documents_for(loan['encodedKey'])
+        if params.get('fullDetails') in ('true', 'True'):
+            return 200, dict(loan, customFieldValues=self._custom_information(
+                loan['encodedKey']))
+        return 200, loan
+
+    def _post_loans(self, rest, params, body):
+        if rest and rest[0] == 'search':
+            return 200, self._search('loans', params, body)
+        if len(rest) > 1 and rest[1] == 'transactions':
+            return self._loan_transaction(
+                self._find('loans', rest[0]), body)
+        fields = self._object(body, 'loanAccount')
+        custom_values = self._custom_values(body)
+        tranches = fields.get('tranches') or []
+        if not isinstance(tranches, list) or not all(
+                isinstance(tranche, dict) for tranche in tranches):
+            raise StandInError(400, 4, 'INVALID_PARAMETERS')
+        if rest:
+            loan = self._find('loans', rest[0])
+            status_code = 200
+        else:
+            self._find('clients', fields.get('accountHolderKey'))
+            self._find('loanproducts', fields.get('productTypeKey'))
+            _decimal(fields.get('loanAmount'))
+            loan = dict(
+                id=self._next_id(), encodedKey=_key(),
+                accountState='PENDING_APPROVAL', creationDate=_now(),
+                principalBalance='0', principalPaid='0', principalDue='0',
+                interestBalance='0', feesDue='0', feesPaid='0',
+                feesBalance='0', tranches=[])
+            self.collections['loans'][loan['id']] = loan
+            status_code = 201
+        loan.update((k, v) for k, v in fields.items()
+                    if k not in ('id', 'encodedKey'))
+        for tranche in loan['tranches']:
+            tranche.setdefault('encodedKey', _key())
+        loan['lastModifiedDate'] = _now()
+        for field_id, value in custom_values:
+            self._set_custom_value(loan['encodedKey'], field_id, value)
+        return status_code, dict(
+            loanAccount=loan,
+            customInformation=self._custom_information(loan['encodedKey']))
+
+    def _delete_loans(self, rest, params, body):
+        loan = self._find('loans', rest[0])
+        if len(rest) > 1:
+            return self._delete_custom_field(loan, rest)
+        if loan['accountState'] not in ('PENDING_APPROVAL',
+                                        'PARTIAL_APPLICATION'):
+            raise StandInError(400, 3, 'INVALID_ACCOUNT_STATE')
+        del self.collections['loans'][loan['id']]
+        return 200, dict(returnCode=0, returnStatus='SUCCESS')
+
+    def _patch_loans(self, rest, params, body):
+        return self._patch_custom_field(
+            self._find('loans', rest[0]), rest, body)
+
+    def _pending_tranches(self, loan):
+        return sorted(
+            [t for t in loan['tranches']
+             if 'disbursementTransactionKey' not in t],
+            key=lambda t: t.get('expectedDisbursementDate'))
+
+    def _require_state(self, loan, *states):
+        if loan['accountState'] not in states:
+            raise StandInError(400, 3, 'INVALID_ACCOUNT_STATE')
+
+    def _loan_transaction(self, loan, body):
+        self._strings(body, 'date', 'firstRepaymentDate', 'notes')
+        _type = body.get('type')
+        handler = getattr(self, '_transaction_' + str(_type).lower(), None)
+        if handler is None:
+            raise StandInError(400, 2, 'INVALID_TRANSACTION_TYPE')
+        result = handler(loan, body)
+        loan['lastModifiedDate'] = _now()
+        return 201, result
+
+    def _record_transaction(self, loan, body, amount, **fields):
+        transaction = dict(
+            encodedKey=_key(), transactionId=self._next_id(numeric=True),
+            parentAccountKey=loan['encodedKey'], type=body['type'],
+            amount=_amount(amount), creationDate=_now(),
+            entryDate=body.get('date') or _now(),
+            balance=loan['principalBalance'], comment=body.get('notes'))
+        transaction.update(fields)
+        self.transactions[loan['encodedKey']].append(transaction)
+        return transaction
+
+    def _transaction_approval(self, loan, body):
+        self._require_state(loan, 'PENDING_APPROVAL')
+        tranches = loan.get('tranches') or []
+        if tranches and sum(_decimal(t['amount']) for t in tranches) != \
+                _decimal(loan['loanAmount']):
+            raise StandInError(400, 3, 'INVALID_TRANCHE_AMOUNT')
+        loan['accountState'] = 'APPROVED'
+        loan['approvedDate'] = _now()
+        return loan
+
+    def _transaction_undo_approval(self, loan, body):
+        self._require_state(loan, 'APPROVED')
+        loan['accountState'] = 'PENDING_APPROVAL'
+        loan.pop('approvedDate', None)
+        return loan
+
+    def _transaction_reject(self, loan, body):
+        self._require_state(loan, 'PENDING_APPROVAL')
+        loan['accountState'] = 'CLOSED_REJECTED'
+        return loan
+
+    def _transaction_withdraw(self, loan, body):
+        self._require_state(loan, 'PENDING_APPROVAL', 'APPROVED')
+        loan['accountState'] = 'CLOSED_WITHDRAWN'
+        return loan
+
+    def _transaction_disbursment(self, loan, body):
+        self._require_state(loan, 'APPROVED', 'ACTIVE')
+        pending = self._pending_tranches(loan)
+        if loan['tranches'] and not pending:
+            raise StandInError(400, 3, 'NO_UNDISBURSED_TRANCHES')
+        if loan['accountState'] == 'ACTIVE' and not loan['tranches']:
+            raise StandInError(400, 3, 'INVALID_ACCOUNT_STATE')
+        if body.get('amount') is not None:
+            amount = _decimal(body['amount'])
+        elif pending:
+            amount = _decimal(pending[0]['amount'])
+        else:
+            amount = _decimal(loan['loanAmount'])
+        loan['principalBalance'] = _amount(
+            _decimal(loan['principalBalance']) + amount)
+        loan['accountState'] = 'ACTIVE'
+        loan['disbursementDate'] = body.get('date') or _now()
+        if body.get('firstRepaymentDate'):
+            loan['firstRepaymentDate'] = body['firstRepaymentDate'][:10] + \
+                'T00:00:00+0000'
+        transaction = self._record_transaction(
+            loan, body, amount, principalPaid=_amount(amount))
+        if pending:
+            pending[0]['disbursementTransactionKey'] = \
+                transaction['encodedKey']
+        return transaction
+
+    def _transaction_disbursment_adjustment(self, loan, body):
+        self._require_state(loan, 'ACTIVE')
+        disbursements = [
+            t for t in self.transactions[loan['encodedKey']]
+            if t['type'] == 'DISBURSMENT' and not t.get('reversed')]
+        if not disbursements:
+            raise StandInError(400, 3, 'NO_DISBURSEMENT_TO_ADJUST')
+        last = disbursements[-1]
+        last['reversed'] = True
+        for tranche in loan['tranches']:
+            if tranche.get('disbursementTransactionKey') == last['encodedKey']:
+                del tranche['disbursementTransactionKey']
+        amount = _decimal(last['amount'])
+        loan['principalBalance'] = _amount(
+            _decimal(loan['principalBalance']) - amount)
+        if len(disbursements) == 1:
+            loan['accountState'] = 'APPROVED'
+        return self._record_transaction(loan, body, amount)
+
+    def _transaction_fee(self, loan, body):
+        self._require_state(loan, 'APPROVED', 'ACTIVE', 'ACTIVE_IN_ARREARS')
+        amount = _decimal(body.get('amount'))
+        loan['feesDue'] = _amount(_decimal(loan['feesDue']) + amount)
+        loan['feesBalance'] = _amount(_decimal(loan['feesBalance']) + amount)
+        return self._record_transaction(loan, body, amount)
+
+    def _transaction_repayment(self, loan, body):
+        self._require_state(loan, 'ACTIVE', 'ACTIVE_IN_ARREARS')
+        amount = _decimal(body.get('amount'))
+        fees = min(amount, _decimal(loan['feesBalance']))
+        principal = min(amount - fees, _decimal(loan['principalBalance']))
+        if fees + principal < amount:
+            raise StandInError(400, 110, 'REPAYMENT_AMOUNT_EXCEEDS_BALANCE')
+        loan['feesBalance'] = _amount(_decimal(loan['feesBalance']) - fees)
+        loan['feesDue'] = _amount(max(_decimal(loan['feesDue']) - fees, 0))
+        loan['feesPaid'] = _amount(_decimal(loan['feesPaid']) + fees)
+        loan['principalBalance'] = _amount(
+            _decimal(loan['principalBalance']) - principal)
+        loan['principalPaid'] = _amount(
+            _decimal(loan['principalPaid']) + principal)
+        if _decimal(loan['principalBalance']) == 0 and \
+                not self._pending_tranches(loan) and \
+                _decimal(loan['feesBalance']) == 0:
+            loan['accountState'] = 'CLOSED'
+        return self._record_transaction(
+            loan, body, amount, principalPaid=_amount(principal),
+            feesPaid=_amount(fees))
+
+    def _transaction_lock(self, loan, body):
+        self._require_state(loan, 'ACTIVE', 'ACTIVE_IN_ARREARS')
+        loan['accountSubState'] = 'LOCKED'
+        return [self._record_transaction(
+            loan, dict(body, type='INTEREST_LOCKED'), 0)]
+
+    def _transaction_unlock(self, loan, body):
+        if loan.get('accountSubState') != 'LOCKED':
+            raise StandInError(400, 3, 'INVALID_ACCOUNT_STATE')
+        del loan['accountSubState']
+        return [self._record_transaction(
+            loan, dict(body, type='INTEREST_UNLOCKED'), 0)]
+
+    # savings
+
+    def _get_savings(self, rest, params, body):
+        if not rest:
+            records = self._filter(
+                self.collections['savings'].values(), params,
+                ['accountState', 'branchId', 'centreId'])
+            return 200, self._page(records, params)
+        account = self._find('savings', rest[0])
+        if len(rest) > 1 and rest[1] == 'transactions':
+            return 200, self._page(
+                reversed(self.transactions[account['encodedKey']]), params)
+        if len(rest) > 1 and rest[1] == 'documents':
+            return 200, self._documents_for(account['encodedKey'])
+        return 200, account
+
+    def _post_savings(self, rest, params, body):
+        if rest and rest[0] == 'search':
+            return 200, self._search('savings', params, body)
+        if len(rest) > 1 and rest[1] == 'transactions':
+            return self._savings_transaction(
+                self._find('savings', rest[0]), body)
+        fields = self._object(body, 'savingsAccount')
+        if rest:
+            account = self._find('savings', rest[0])
+            status_code = 200
+        else:
+            account = dict(id=self._next_id(), encodedKey=_key(),
+                           accountState='ACTIVE', balance='0',
+                           creationDate=_now())
+            self.collections['savings'][account['id']] = account
+            status_code = 201
+        account.update((k, v) for k, v in fields.items()
+                       if k not in ('id', 'encodedKey'))
+        account['lastModifiedDate'] = _now()
+        return status_code, dict(savingsAccount=account)
+
+    def _savings_transaction(self, account, body):
+        self._strings(body, 'date', 'notes')
+        amount = _decimal(body.get('amount'))
+        balance = _decimal(account['balance'])
+        if body.get('type') == 'DEPOSIT':
+            balance += amount
+        elif body.get('type') in ('WITHDRAWAL', 'TRANSFER'):
+            if amount > balance:
+                raise StandInError(400, 412, 'BALANCE_BELOW_ZERO')
+            balance -= amount
+        else:
+            raise StandInError(400, 2, 'INVALID_TRANSACTION_TYPE')
+        account['balance'] = _amount(balance)
+        account['lastModifiedDate'] = _now()
+        transaction = dict(
+            encodedKey=_key(), transactionId=self._next_id(numeric=True),
+            parentAccountKey=account['encodedKey'], type=body['type'],
+            amount=_amount(amount), balance=account['balance'],
+            creationDate=_now(), entryDate=body.get('date') or _now(),
+            comment=body.get('notes'))
+        self.transactions[account['encodedKey']].append(transaction)
+        return 201, transaction
+
+    def _patch_savings(self, rest, params, body):
+        return self._patch_custom_field(
+            self._find('savings', rest[0]), rest, body)
+
+    def _delete_savings(self, rest, params, body):
+        return self._delete_custom_field(self._find('savings', rest[0]), rest)
+
+    # search
+
+    def _search(self, collection, params, body):
+        constraints = body.get('filterConstraints') or []
+        records = [r for r in self.collections[collection].values()
+                   if all(_matches(r, c) for c in constraints)]
+        return self._page(records, params)
+
+    # documents
+
+    def _documents_for(self, holder_key):
+        return [d for d in self.collections['documents'].values()
+                if d['documentHolderKey'] == holder_key]
+
+    def _get_documents(self, rest, params, body):
+        document = self._find('documents', rest[0])
+        return 200, dict(document=document,
+                         documentContent=self.contents[document['encodedKey']])
+
+    def _post_documents(self, rest, params, body):
+        fields = self._object(body, 'document')
+        content = body.get('documentContent') or ''
+        try:
+            size = len(base64.b64decode(content))
+        except TypeError:
+            raise StandInError(400, 9, 'INVALID_DOCUMENT_CONTENT')
+        document = dict(fields, id=self._next_id(numeric=True),
+                        encodedKey=_key(), fileSize=size, creationDate=_now(),
+                        lastModifiedDate=_now())
+        self.collections['documents'][document['id']] = document
+        self.contents[document['encodedKey']] = content
+        return 201, document
+
+    def _delete_documents(self, rest, params, body):
+        document = self._find('documents', rest[0])
+        del self.collections['documents'][document['id']]
+        del self.contents[document['encodedKey']]
+        return 200, dict(returnCode=0, returnStatus='SUCCESS')
+
+    def __getattr__(self, name):
+        # documents of the other attachment entities are looked up by holder
+        if name.startswith('_get_'):
+            def _get_entity_documents(rest, params, body):
+                if len(rest) != 2 or rest[1] != 'documents':
+                    raise StandInError(404, 1, 'INVALID_API_OPERATION')
+                return 200, self._documents_for(rest[0])
+            if name[5:] in ('groups', 'savingsproducts', 'branches',
+                            'centres', 'users'):
+                return _get_entity_documents
+        raise AttributeError(name)
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Decodes http requests for the MambuState of the server and applies
+    the latency and failures configured on the StandInMambu"""
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        standin = self.server.standin
+        raw = self._read_body()
+        parsed = urlparse.urlparse(self.path)
+        standin.record(self.command, parsed.path)
+        injected = standin.failure()
+        if standin.latency:
+            time.sleep(standin.latency + random.random() * standin.jitter)
+        if injected is not None:
+            return self._respond(*injected)
+        if not parsed.path.startswith('/api/'):
+            return self._respond(404, dict(
+                returnCode=1, returnStatus='INVALID_API_OPERATION'))
+        segments = [s for s in parsed.path[len('/api/'):].split('/') if s]
+        params = dict(urlparse.parse_qsl(parsed.query))
+        try:
+            body = json.loads(raw) if raw else None
+            status_code, result = standin.state.handle(
+                self.command, segments, params, body)
+        except StandInError as e:
+            status_code, result = e.status_code, e.body
+        except ValueError:
+            status_code, result = 400, dict(returnCode=4,
+                                            returnStatus='INVALID_JSON')
+        except Exception:
+            # answered like mambu rather than dropping the connection
+            logger.exception('Stand-in failed handling %s %s', self.command,
+                             parsed.path)
+            status_code, result = 500, dict(returnCode=-1,
+                                            returnStatus='INTERNAL_ERROR')
+        self._respond(status_code, result)
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(';', 1)[0], 16)
+                if not size:
+                    self.rfile.readline()
+                    return ''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else ''
+
+    def _respond(self, status_code, result, headers=None):
+        payload = json.dumps(result)
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_PUT = _handle
+
+    def log_message(self, format, *args):
+        if self.server.standin.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(
+                self, format, *args)
+
+
+class StandInServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StandInMambu(object):
+    """Serves a MambuState over http on a background thread
+
+    Parameters
+    ----------
+    host: str
+        Optional. Defaults to 127.0.0.1
+    port: int
+        Optional. Defaults to 0 to pick a free port
+    latency: float
+        Optional. Defaults to 0. seconds added to every response
+    jitter: float
+        Optional. Defaults to 0. up to this many seconds are added to latency
+        at random
+    error_rate: float
+        Optional. Defaults to 0. fraction of requests answered with a 500
+    throttle_rate: float
+        Optional. Defaults to 0. fraction of requests answered with a 429
+    retry_after: float
+        Optional. Defaults to 1. Retry-After sent with 429 responses
+    verbose: bool
+        Optional. Defaults to False. log every request to stderr
+    max_requests: int
+        Optional. Defaults to 1000. number of the most recent (method, path)
+        requests kept in requests.  request_count counts every request
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency=0, jitter=0,
+                 error_rate=0, throttle_rate=0, retry_after=1, verbose=False,
+                 max_requests=1000):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.verbose = verbose
+        self.state = MambuState()
+        self.requests = collections.deque(maxlen=max_requests)
+        self.request_count = 0
+        self.injected = collections.deque()
+        self.lock = threading.Lock()
+        self.server = StandInServer((host, port), StandInHandler)
+        self.server.standin = self
+        self.thread = None
+
+    @property
+    def domain(self):
+        return '{}:{}'.format(*self.server.server_address[:2])
+
+    def config(self, **settings):
+        """Return a Config for an API talking to the stand-in, with any other
+        settings given as keyword arguments
+
+        Returns
+        -------
+        Config
+        """
+        config_ = Config()
+        config_.domain = self.domain
+        config_.scheme = 'http'
+        config_.username = 'standin'
+        config_.password = 'standin'
+        for name, value in settings.items():
+            setattr(config_, name, value)
+        return config_
+
+    def inject(self, status_code, count=1, retry_after=None):
+        """Answer the next count requests with status_code regardless of the
+        configured rates"""
+        with self.lock:
+            for _ in range(count):
+                self.injected.append((status_code, retry_after))
+
+    def failure(self):
+        """Return the (status code, body, headers) of an injected failure for
+        the current request, or None to handle it normally"""
+        with self.lock:
+            injected = self.injected.popleft() if self.injected else None
+        if injected is None:
+            roll = random.random()
+            if roll < self.throttle_rate:
+                injected = (429, self.retry_after)
+            elif roll < self.throttle_rate + self.error_rate:
+                injected = (500, None)
+        if injected is None:
+            return None
+        status_code, retry_after = injected
+        headers = {}
+        if status_code == 429:
+            headers['Retry-After'] = str(
+                self.retry_after if retry_after is None else retry_after)
+        return status_code, dict(returnCode=950 + status_code % 100,
+                                 returnStatus='INJECTED_FAILURE'), headers
+
+    def record(self, method, path):
+        with self.lock:
+            self.requests.append((method, path))
+            self.request_count += 1
+
+    def requests_since(self, count):
+        """Return the (method, path) of the requests received after the
+        request_count was count, as far as they are still kept
+
+        Parameters
+        ----------
+        count: int
+            an earlier request_count
+
+        Returns
+        -------
+        list(tuple)
+        """
+        with self.lock:
+            recent = list(self.requests)
+            received = self.request_count - count
+        return recent[len(recent) - min(received, len(recent)):]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local mambu stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--jitter', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--throttle-rate', type=float, default=0)
+    parser.add_argument('--retry-after', type=float, default=1)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+    standin = StandInMambu(
+        args.host, args.port, args.latency, args.jitter, args.error_rate,
+        args.throttle_rate, args.retry_after, args.verbose)
+    print 'Serving mambu stand-in on http://{}/api/'.format(standin.domain)
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        standin.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Array backed business day index used by the business day helpers of
+datelib, kept apart so that numpy is only imported once they are used"""
+import datetime
+import threading
+
+import numpy
+
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+class BusinessDayTable(object):
+    """Array backed index of the business days of a holiday calendar for a
+    range of years.  A flag for every day and the running count of business
+    days up to it make offsets, counts and checks a couple of array lookups.
+    The range is extended, a few years at a time, when a date or offset falls
+    outside of it.  Dates are given as days since 1970-01-01, scalars or
+    numpy arrays
+
+    Parameters
+    ----------
+    calendar: AbstractHolidayCalendar
+        calendar whose holidays are not business days, along with weekends
+    start_year: int
+        Optional. Defaults to 2000. first year of the table
+    end_year: int
+        Optional. Defaults to 2040. last year of the table
+    """
+    # years added to the range whenever it is extended
+    extend_years = 10
+
+    def __init__(self, calendar, start_year=2000, end_year=2040):
+        self.calendar = calendar
+        self.lock = threading.Lock()
+        self.years = None
+        self.table = None
+        self._build(start_year, end_year)
+
+    def _build(self, start_year, end_year):
+        start = datetime.date(start_year, 1, 1)
+        end = datetime.date(end_year, 12, 31)
+        first = start.toordinal() - EPOCH_ORDINAL
+        days = numpy.arange(first, end.toordinal() - EPOCH_ORDINAL + 1)
+        # 1970-01-01 was a Thursday so day 0 has weekday 3
+        flags = (days + 3) % 7 < 5
+        for holiday in self.calendar.holidays(start, end):
+            flags[holiday.date().toordinal() - EPOCH_ORDINAL - first] = False
+        # replaced as a whole so that readers never see a partial table
+        self.years = start_year, end_year
+        self.table = first, flags, numpy.cumsum(flags), days[flags]
+
+    def _extend(self, years, before, after):
+        with self.lock:
+            if self.years != years:
+                # already extended by another thread
+                return
+            start_year, end_year = years
+            if before:
+                start_year -= self.extend_years
+            if after:
+                end_year += self.extend_years
+            self._build(start_year, end_year)
+
+    def _lookup(self, *days):
+        """Return the table covering every day along with the positions of
+        the days in it, extending the table as needed"""
+        while True:
+            years, table = self.years, self.table
+            first, flags = table[:2]
+            positions = [numpy.asarray(d) - first for d in days]
+            low = min(numpy.min(p) for p in positions) < 0
+            high = max(numpy.max(p) for p in positions) >= len(flags)
+            if not (low or high):
+                return table, positions
+            self._extend(years, low, high)
+
+    def is_bday(self, days):
+        """Return whether days are business days
+
+        Returns
+        -------
+        bool, numpy.ndarray
+        """
+        (_, flags, _, _), (positions,) = self._lookup(days)
+        return flags[positions]
+
+    def offset(self, days, n):
+        """Return the day n business days after days, or before when n is
+        negative.  When n is 0 days are rolled forward to the next business
+        day if they are not one already
+
+        Returns
+        -------
+        int, numpy.ndarray
+        """
+        n = numpy.asarray(n)
+        while True:
+            years = self.years
+            (_, flags, counts, bdays), (positions,) = self._lookup(days)
+            # counts - flags is the index in bdays of the first business day
+            # on or after each day
+            index = numpy.where(n > 0, counts[positions] + n - 1,
+                                counts[positions] - flags[positions] + n)
+            low = numpy.min(index) < 0
+            high = numpy.max(index) >= len(bdays)
+            if not (low or high):
+                return bdays[index]
+            self._extend(years, low, high)
+
+    def count(self, start_days, end_days):
+        """Return the number of business days after start_days up to and
+        including end_days, negative when end_days are before start_days
+
+        Returns
+        -------
+        int, numpy.ndarray
+        """
+        (_, _, counts, _), (starts, ends) = self._lookup(start_days, end_days)
+        return counts[ends] - counts[starts]
+
+    def between(self, start_day, end_day):
+        """Return the business days from start_day to end_day inclusive
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        (_, _, _, bdays), _ = self._lookup(start_day, end_day)
+        return bdays[numpy.searchsorted(bdays, start_day):
+                     numpy.searchsorted(bdays, end_day, side='right')]
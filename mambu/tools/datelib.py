@@ -1,9 +1,6 @@
 import datetime
-
-from dateutil import parser
-from pandas.tseries.offsets import CustomBusinessDay
-
-from .calendars import UKHolidayCalendar
+import re
+import threading
 
 
 def date_today():
@@ -30,16 +27,165 @@ def datetime_today():
     return datetime.datetime.combine(date_today(), datetime.time(0))
 
 
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def uk_bday_table():
+    """Return the BusinessDayTable of the UK holiday calendar, building it on
+    first use.  numpy and pandas are imported here rather than with datelib
+
+    Returns
+    -------
+    mambu.tools.bdays.BusinessDayTable
+    """
+    with _tables_lock:
+        table = _tables.get('uk')
+        if table is None:
+            from .bdays import BusinessDayTable
+            from .calendars import UKHolidayCalendar
+            table = _tables['uk'] = BusinessDayTable(UKHolidayCalendar())
+    return table
+
+
+def _epoch_day(candidate):
+    if not isinstance(candidate, datetime.date):
+        candidate = coerce_date(candidate)
+    elif isinstance(candidate, datetime.datetime):
+        candidate = candidate.date()
+    return candidate.toordinal() - EPOCH_ORDINAL
+
+
+def _epoch_days(candidates):
+    """Convert a sequence of dates, datetimes or numpy datetime64 values to
+    an array of epoch days"""
+    import numpy
+    return numpy.asarray(candidates, dtype='datetime64[D]').astype('int64')
+
+
 def next_n_bday(start_date=None, n=1):
+    """Return the date n UK business days after start_date, or before it when
+    n is negative, keeping the type and time of day of start_date
+
+    Parameters
+    ----------
+    start_date: date, datetime, str
+        Optional. Defaults to today
+    n: int
+        Optional. Defaults to 1
+
+    Returns
+    -------
+    datetime.date, datetime.datetime
+    """
     if start_date is None:
         start_date = date_today()
-    return start_date + CustomBusinessDay(calendar=UKHolidayCalendar(), n=n)
+    elif not isinstance(start_date, datetime.date):
+        start_date = coerce_datetime(start_date)
+    day = _epoch_day(start_date)
+    return start_date + datetime.timedelta(
+        days=int(uk_bday_table().offset(day, n)) - day)
 
 
 def next_bday(start_date=None):
     return next_n_bday(start_date, 1)
 
 
+def is_bday(candidate):
+    """Return whether candidate is a UK business day
+
+    Parameters
+    ----------
+    candidate: date, datetime, str
+
+    Returns
+    -------
+    bool
+    """
+    return bool(uk_bday_table().is_bday(_epoch_day(candidate)))
+
+
+def count_bdays(start_date, end_date):
+    """Return the number of UK business days after start_date up to and
+    including end_date
+
+    Parameters
+    ----------
+    start_date: date, datetime, str
+    end_date: date, datetime, str
+
+    Returns
+    -------
+    int
+    """
+    return int(uk_bday_table().count(
+        _epoch_day(start_date), _epoch_day(end_date)))
+
+
+def bdays_between(start_date, end_date):
+    """Return the UK business days from start_date to end_date inclusive
+
+    Parameters
+    ----------
+    start_date: date, datetime, str
+        first day of the range
+    end_date: date, datetime, str
+        last day of the range
+
+    Returns
+    -------
+    list(datetime.date)
+    """
+    days = uk_bday_table().between(
+        _epoch_day(start_date), _epoch_day(end_date))
+    return [datetime.date.fromordinal(int(d) + EPOCH_ORDINAL) for d in days]
+
+
+def next_n_bdays(dates, n=1):
+    """Vectorised next_n_bday over a sequence of dates
+
+    Parameters
+    ----------
+    dates: sequence
+        dates, datetimes or numpy datetime64 values
+    n: int, sequence
+        business days to move each date by
+
+    Returns
+    -------
+    numpy.ndarray
+        datetime64[D] array
+    """
+    days = uk_bday_table().offset(_epoch_days(dates), n)
+    return days.astype('datetime64[D]')
+
+
+def is_bdays(dates):
+    """Vectorised is_bday over a sequence of dates
+
+    Returns
+    -------
+    numpy.ndarray
+        bool array
+    """
+    return uk_bday_table().is_bday(_epoch_days(dates))
+
+
+def count_bdays_between(start_dates, end_dates):
+    """Vectorised count_bdays over sequences of dates
+
+    Returns
+    -------
+    numpy.ndarray
+        int array
+    """
+    return uk_bday_table().count(
+        _epoch_days(start_dates), _epoch_days(end_dates))
+
+
 def coerce_date(candidate, dayfirst=False):
     result = coerce_datetime(candidate, dayfirst=dayfirst)
     try:
@@ -49,8 +195,47 @@ def coerce_date(candidate, dayfirst=False):
     return result
 
 
+# yyyy-MM-dd optionally followed by a time and utc offset, as sent by mambu
+ISO_PATTERN = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})'
+    r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6})\d*)?)?'
+    r'(Z|[+-]\d{2}:?\d{2})?)?$')
+
+# strings coerced by coerce_datetime are memoised, the cache being cleared
+# whenever it reaches PARSE_CACHE_SIZE entries
+PARSE_CACHE_SIZE = 4096
+_parse_cache = {}
+
+
+def _parse_iso(candidate):
+    """Parse candidate if it is an ISO 8601 date or datetime, returning None
+    otherwise"""
+    match = ISO_PATTERN.match(candidate)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    tzinfo = None
+    if offset is not None:
+        from dateutil import tz
+    if offset == 'Z':
+        tzinfo = tz.tzutc()
+    elif offset is not None:
+        sign = -1 if offset[0] == '-' else 1
+        offset = offset[1:].replace(':', '')
+        seconds = sign * (int(offset[:2]) * 3600 + int(offset[2:]) * 60)
+        tzinfo = tz.tzutc() if seconds == 0 else tz.tzoffset(None, seconds)
+    try:
+        return datetime.datetime(
+            int(year), int(month), int(day), int(hour or 0), int(minute or 0),
+            int(second or 0), int((fraction or '0').ljust(6, '0')), tzinfo)
+    except ValueError:
+        return None
+
+
 def coerce_datetime(candidate, dayfirst=False):
-    """Coerce the candidate into a datetime.datetime if possible
+    """Coerce the candidate into a datetime.datetime if possible.  Strings
+    in the ISO formats used by mambu are parsed directly, any other string
+    with dateutil, and the result for each string is memoised
 
     Parameters
     ----------
@@ -65,20 +250,81 @@ def coerce_datetime(candidate, dayfirst=False):
     datetime.datetime, datetime.date
     """
     if candidate is None:
-        result = None
+        return None
     elif isinstance(candidate, datetime.datetime):
-        result = candidate
+        return candidate
     elif isinstance(candidate, datetime.date):
-        result = datetime.datetime.combine(candidate, datetime.time(0))
-    else:
+        return datetime.datetime.combine(candidate, datetime.time(0))
+    key = (candidate, dayfirst)
+    result = _parse_cache.get(key)
+    if result is not None:
+        return result
+    result = None if dayfirst else _parse_iso(candidate)
+    if result is None:
+        from dateutil import parser
         try:
             result = parser.parse(candidate, dayfirst=dayfirst)
         except ValueError:
             raise ValueError(
                 'Could not coerce datetime from candidate %s' % candidate)
+    if len(_parse_cache) >= PARSE_CACHE_SIZE:
+        _parse_cache.clear()
+    _parse_cache[key] = result
     return result
 
 
+def coerce_datetimes(candidates, dayfirst=False):
+    """Coerce every candidate into a datetime.datetime, see coerce_datetime
+
+    Parameters
+    ----------
+    candidates: iterable
+        strs, dates or datetimes
+    dayfirst: bool
+        Optional. Defaults to False. passed to coerce_datetime
+
+    Returns
+    -------
+    list(datetime.datetime)
+    """
+    return [coerce_datetime(c, dayfirst) for c in candidates]
+
+
+def coerce_dates(candidates, dayfirst=False):
+    """Coerce every candidate into a datetime.date, see coerce_date
+
+    Parameters
+    ----------
+    candidates: iterable
+        strs, dates or datetimes
+    dayfirst: bool
+        Optional. Defaults to False. passed to coerce_datetime
+
+    Returns
+    -------
+    list(datetime.date)
+    """
+    return [None if d is None else d.date()
+            for d in coerce_datetimes(candidates, dayfirst)]
+
+
+def mambu_dates(candidates):
+    """Format every candidate as a yyyy-MM-dd string, see mambu_date.  Strings
+    already starting with one are sliced rather than parsed
+
+    Parameters
+    ----------
+    candidates: iterable
+        strs, dates or datetimes
+
+    Returns
+    -------
+    list(str)
+    """
+    return [mambu_day(c) if isinstance(c, basestring) else mambu_date(c)
+            for c in candidates]
+
+
 def format_datetime(datetime_candidate, format_str):
     """Coerce the candidate_datetime before applying the specified format
 
@@ -139,6 +385,24 @@ def mambu_date(date_candidate):
     return format_datetime(date_candidate, '%Y-%m-%d')
 
 
+def mambu_day(datestr):
+    """Return the yyyy-MM-dd date of a mambu date or datetime string without
+    parsing it when it already starts with one
+
+    Parameters
+    ----------
+    datestr: str
+        date string e.g. '2015-04-25T12:30:45+0000'
+
+    Returns
+    -------
+    str
+    """
+    if len(datestr) >= 10 and datestr[4] == '-' and datestr[7] == '-':
+        return datestr[:10]
+    return mambu_date(datestr)
+
+
 def mambu_datetime(datetime_candidate):
     """Given a candidate date or datetime, coerce into a datetime
 
@@ -1,6 +1,13 @@
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 
+import numpy
+import pandas
+from dateutil import parser
+from pandas.tseries.offsets import CustomBusinessDay
+
+from mambu.tools.bdays import BusinessDayTable
 from mambu.tools import datelib
+from mambu.tools.calendars import UKHolidayCalendar
 
 
 def test_next_bday():
@@ -46,3 +53,70 @@ def test_mambu_datetime():
                                   ) == '2015-04-25T06:51:00'
     assert datelib.mambu_datetime(datetime(2015, 4, 25, 6, 51, 23)
                                   ) == '2015-04-25T06:51:23'
+
+
+def test_bdays_between():
+    assert datelib.bdays_between('2015-12-24', date(2016, 1, 4)) == [
+        date(2015, 12, 24), date(2015, 12, 29), date(2015, 12, 30),
+        date(2015, 12, 31), date(2016, 1, 4)]
+
+
+def test_bday_table_matches_pandas():
+    offset = CustomBusinessDay(calendar=UKHolidayCalendar())
+    days = [date(2015, 12, 18) + timedelta(days=d) for d in range(30)]
+    for n in (-3, -1, 0, 1, 2, 5):
+        expected = [(pandas.Timestamp(d) + offset * n).date() for d in days]
+        assert [datelib.next_n_bday(d, n) for d in days] == expected
+        assert list(datelib.next_n_bdays(days, n)) == \
+            list(numpy.array(expected, dtype='datetime64[D]'))
+
+
+def test_is_bday():
+    assert datelib.is_bday(date(2015, 12, 24))
+    assert not datelib.is_bday('2015-12-25')
+    assert not datelib.is_bday(datetime(2015, 12, 26, 10))
+    assert list(datelib.is_bdays(['2015-12-24', '2015-12-28'])) == \
+        [True, False]
+
+
+def test_count_bdays():
+    assert datelib.count_bdays(date(2015, 12, 24), date(2016, 1, 4)) == 4
+    assert datelib.count_bdays(date(2016, 1, 4), date(2015, 12, 24)) == -4
+    assert list(datelib.count_bdays_between(
+        [date(2015, 12, 24), date(2015, 12, 28)],
+        [date(2015, 12, 29), date(2015, 12, 29)])) == [1, 1]
+
+
+def test_bday_table_extends_lazily():
+    table = BusinessDayTable(UKHolidayCalendar(), 2015, 2015)
+    day = date(2040, 1, 3).toordinal() - datelib.EPOCH_ORDINAL
+    assert table.is_bday(day)
+    assert table.years[1] >= 2040
+    assert table.offset(0, -1) == -1
+
+
+def test_coerce_datetime_iso_fast_path_matches_dateutil():
+    for candidate in ['2015-04-25', '2015-04-25T12:30:45',
+                      '2015-04-25T12:30:45+0100', '2015-04-25 12:30',
+                      '2015-04-25T12:30:45.25-05:30']:
+        assert datelib._parse_iso(candidate) == parser.parse(candidate)
+    assert datelib._parse_iso('2015-04-25T12:30:45+0000').utcoffset() == \
+        timedelta(0)
+    assert datelib._parse_iso('25-Apr-15') is None
+    assert datelib._parse_iso('2015-02-30') is None
+
+
+def test_coerce_datetime_memoised():
+    first = datelib.coerce_datetime('2015-04-26T01:02:03+0000')
+    assert datelib.coerce_datetime('2015-04-26T01:02:03+0000') is first
+    assert datelib.coerce_datetime('26-04-2015', dayfirst=True) == \
+        datetime(2015, 4, 26)
+
+
+def test_batch_coercion():
+    candidates = ['2015-04-25T12:30:45+0000', date(2015, 4, 26),
+                  '27-Apr-15', None]
+    assert datelib.coerce_dates(candidates) == [
+        date(2015, 4, 25), date(2015, 4, 26), date(2015, 4, 27), None]
+    assert datelib.mambu_dates(candidates[:3]) == [
+        '2015-04-25', '2015-04-26', '2015-04-27']
@@ -1,8 +1,12 @@
 #!/usr/bin/env python
 
+import os
+
 from setuptools import setup
 
-__version__ = '0.0.20'
+# read rather than imported so that building does not import the package
+with open(os.path.join(os.path.dirname(__file__), 'mambu', 'version.py')) as f:
+    exec(f.read())
 
 setup(
     name='Mambu',
@@ -12,7 +16,7 @@ setup(
     author_email='hansel.dunlop@paze.me',
     url='https://www.mambu.com',
     packages=['mambu', 'mambu.etc', 'mambu.tools'],
-    package_data={'mambu': ['etc/*.yaml']},
+    package_data={'mambu': ['etc/*.yaml', 'etc/*.pickle']},
     install_requires=[
         'requests'
     ]
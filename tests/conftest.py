@@ -1,13 +1,96 @@
+import os
 import pytest
 from random import choice
+import shutil
 import string
+import tempfile
 
+# keep the pickled metadata built while testing out of the package and the
+# user cache.  Set before mambu is first imported since it loads the metadata
+os.environ['MAMBU_CACHE_DIR'] = tempfile.mkdtemp(prefix='mambu-test-')
+
+from mambu.api import API
+from mambu.config import Config
+from mambu.standin import StandInMambu
 from mambu.tools import datelib
+from tests.fakes import fake_config
 
 
 titles = ['Mr', 'Mrs', 'Ms', 'Prof', 'Dr', 'Eng']
 
 
+@pytest.fixture(scope='session', autouse=True)
+def metadata_cache():
+    """Directory of the pickled metadata, removed after the test session"""
+    yield os.environ['MAMBU_CACHE_DIR']
+    shutil.rmtree(os.environ['MAMBU_CACHE_DIR'], ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def standin():
+    """Local mambu stand-in shared by the whole test session"""
+    with StandInMambu() as _standin:
+        yield _standin
+
+
+@pytest.fixture(scope='function')
+def mambuapi(standin):
+    """API for the mambu sandbox named by the MAMBU_DOMAIN, MAMBU_USERNAME and
+    MAMBU_PASSWORD environment variables, or for the local stand-in when they
+    are not set.  A new API is built for every test and closed after it so
+    that its executor threads do not outlive the test"""
+    if 'MAMBU_DOMAIN' in os.environ:
+        config = Config()
+        config.domain = os.environ['MAMBU_DOMAIN']
+        config.username = os.environ['MAMBU_USERNAME']
+        config.password = os.environ['MAMBU_PASSWORD']
+    else:
+        config = standin.config()
+    with API(config) as api:
+        yield api
+
+
+@pytest.fixture(scope='function')
+def make_api():
+    """Build an API from config, or from a fake_config with any settings given
+    as keyword arguments, closing it when the test ends so that no executor
+    threads outlive the test"""
+    apis = []
+
+    def _make_api(config=None, **settings):
+        api = API(config or fake_config(**settings))
+        apis.append(api)
+        return api
+    yield _make_api
+    for api in apis:
+        api.close()
+
+
+@pytest.fixture(scope='function')
+def api_with_responses(make_api, monkeypatch):
+    """Build an API, as make_api does, whose requests are answered in turn
+    from a list of responses instead of being sent.  A response may be an
+    exception to raise, and responses may instead be a callable returning
+    the response to (method, url, params).  Returns the API along with the
+    list of (method, url, headers, params, data_str) of the requests"""
+    def _api_with_responses(responses, config=None, **settings):
+        api = make_api(config, **settings)
+        sent = []
+
+        def _send(method, url, headers, params, data_str, stream=False):
+            sent.append((method, url, headers, params, data_str))
+            if callable(responses):
+                response = responses(method, url, params)
+            else:
+                response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        monkeypatch.setattr(api, '_send', _send)
+        return api, sent
+    return _api_with_responses
+
+
 @pytest.fixture(scope='function')
 def password():
     """Static password meeting mambu complexity requirements"""
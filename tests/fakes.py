@@ -0,0 +1,38 @@
+import json
+
+from mambu.config import Config
+
+
+class FakeResponse(object):
+    """Stand in for requests.Response holding body encoded as json"""
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(body if body is not None else {})
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        for n in range(0, len(self.content), chunk_size):
+            yield self.content[n:n + chunk_size]
+
+
+def fake_config(**settings):
+    """Return a Config for a tenant that is never contacted, for APIs whose
+    requests are faked, with any other settings given as keyword arguments
+
+    Returns
+    -------
+    Config
+    """
+    config_ = Config()
+    config_.domain = 'example.mambu.com'
+    config_.username = 'user'
+    config_.password = 'password'
+    for name, value in settings.items():
+        setattr(config_, name, value)
+    return config_
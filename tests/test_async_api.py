@@ -0,0 +1,61 @@
+import inspect
+import threading
+import time
+
+import pytest
+
+from mambu.api import API
+from mambu.async_api import AsyncAPI
+from mambu.config import Config
+from mambu.exception import MambuAPIException
+from tests.fakes import fake_config
+
+
+def test_async_api_mirrors_api():
+    public = [name for name, _ in inspect.getmembers(API, inspect.ismethod)
+              if not name.startswith(('_', 'iter_', 'scan_', 'bulk'))]
+    for name in public:
+        assert hasattr(AsyncAPI, name), name
+
+
+def test_async_api_submit():
+    with AsyncAPI(fake_config(), max_workers=2) as async_api:
+        results = [async_api.submit(lambda x: x * 2, n) for n in range(5)]
+        assert [r.get() for r in results] == [0, 2, 4, 6, 8]
+
+
+def test_async_api_defaults_to_many_requests_in_flight():
+    started = []
+    release = threading.Event()
+
+    def _wait():
+        started.append(True)
+        release.wait(5)
+    with AsyncAPI(fake_config()) as async_api:
+        adapter = async_api.api.session.get_adapter('https://mambu')
+        assert adapter._pool_maxsize == Config.async_max_workers
+        results = [async_api.submit(_wait)
+                   for _ in range(Config.async_max_workers)]
+        deadline = time.time() + 5
+        while len(started) < len(results) and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for result in results:
+            result.get()
+    assert len(started) == Config.async_max_workers
+
+
+def test_async_api_calls_api_methods(standin):
+    with AsyncAPI(standin.config()) as async_api:
+        products = [async_api.get_loan_product(product_id)
+                    for product_id in ('salary_advance', 'tranched_loan')]
+        assert [p.get()['id'] for p in products] == [
+            'salary_advance', 'tranched_loan']
+
+
+def test_async_api_errors_raised_from_get(standin):
+    with AsyncAPI(standin.config()) as async_api:
+        result = async_api.get_client('does-not-exist')
+        with pytest.raises(MambuAPIException) as exc:
+            result.get()
+    assert exc.value.code == 404
@@ -1,5 +1,13 @@
+import base64
+import io
+import json
+import os
 import pytest
 
+from mambu.api import API
+from mambu.codec import get_codec
+from mambu.documents import iter_document_body, write_document_content
+
 
 @pytest.mark.slow
 def test_attachments_for_client(mambuapi, user_in_mambu_id):
@@ -36,3 +44,62 @@ def test_create_and_attachment(mambuapi, user_in_mambu):
     # mambuapi.delete_attachment(doc['encodedKey'])
     # after_delete = mambuapi.get_attachment_by_entity('clients', client_id)
     # assert len(after_delete) == 0
+
+
+@pytest.mark.slow
+def test_upload_and_download_attachment_streamed(standin, user_in_mambu):
+    content = os.urandom(10000)
+    with API(standin.config(stream_chunk_size=100)) as api:
+        doc = api.upload_attachment(
+            user_in_mambu['client']['encodedKey'], 'CLIENT', 'scan', 'bin',
+            io.BytesIO(content))
+        assert doc['fileSize'] == len(content)
+        sink = io.BytesIO()
+        fields = api.download_attachment(doc['id'], sink)
+    assert sink.getvalue() == content
+    assert fields['document']['id'] == doc['id']
+    assert 'documentContent' not in fields
+
+
+def test_write_document_content_across_chunk_boundaries():
+    content = os.urandom(301)
+    body = json.dumps(dict(document=dict(name='a'),
+                           documentContent=base64.b64encode(content)))
+    body = body.replace('/', '\\/')
+    for size in (1, 2, 5, 17, len(body)):
+        chunks = [body[n:n + size] for n in range(0, len(body), size)]
+        sink = io.BytesIO()
+        fields = write_document_content(chunks, sink, get_codec('json'))
+        assert sink.getvalue() == content
+        assert fields == dict(document=dict(name='a'))
+
+
+def test_iter_document_body_is_valid_json():
+    content = os.urandom(1000)
+    body = ''.join(iter_document_body(
+        dict(name='a'), io.BytesIO(content), 64, get_codec('json')))
+    decoded = json.loads(body)
+    assert decoded['document'] == dict(name='a')
+    assert base64.b64decode(decoded['documentContent']) == content
+
+
+@pytest.mark.slow
+def test_get_attachments_by_entity(mambuapi, user_in_mambu):
+    client = user_in_mambu['client']
+    contents = dict(('doc{}'.format(n), os.urandom(50 * n)) for n in range(4))
+    for name, content in contents.items():
+        mambuapi.create_attachment(
+            client['encodedKey'], 'CLIENT', name, 'bin', content)
+    documents = mambuapi.get_attachments_by_entity('clients', client['id'])
+    assert dict((d['document']['name'],
+                 base64.b64decode(d['documentContent'])) for d in documents) \
+        == contents
+
+    sinks = {}
+
+    def sink(document):
+        return sinks.setdefault(document['name'], io.BytesIO())
+    fetched = mambuapi.get_attachments_by_entity(
+        'clients', client['id'], sink=sink)
+    assert len(fetched) == len(contents)
+    assert dict((name, f.getvalue()) for name, f in sinks.items()) == contents
@@ -0,0 +1,72 @@
+import pytest
+
+from mambu.api import API
+from mambu.breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+from mambu.exception import MambuAPIException
+from mambu.metrics import MetricsRegistry
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_probes_and_closes():
+    clock = Clock()
+    changes = []
+    breaker = CircuitBreaker(2, 10, changes.append, clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    clock.now = 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+    assert changes == [OPEN, HALF_OPEN, CLOSED]
+
+
+def test_failed_probe_reopens():
+    clock = Clock()
+    breaker = CircuitBreaker(3, 10, clock=clock)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.retry_in() == 10
+    assert not breaker.allow()
+
+
+def test_open_circuit_fails_fast(standin):
+    registry = MetricsRegistry()
+    config = standin.config(retries=0, breaker_threshold=5,
+                            breaker_thresholds={'loanproducts': 2},
+                            metrics_enabled=True, metrics_registry=registry)
+    with API(config) as api:
+        standin.inject(503, count=2)
+        for _ in range(2):
+            with pytest.raises(MambuAPIException) as exc:
+                api.get_loan_product('salary_advance')
+            assert exc.value.code == 503
+        before = standin.request_count
+        with pytest.raises(MambuAPIException) as exc:
+            api.get_loan_product('salary_advance')
+        assert exc.value.return_status == 'CIRCUIT_OPEN'
+        assert standin.request_count == before
+        # other endpoint groups are unaffected
+        assert api.get_custom_field('c_marital_status')
+    assert 'mambu_circuit_state{group="loanproducts"} 2' in \
+        registry.exposition()
+
+
+def test_circuit_breaking_is_opt_in(make_api):
+    assert make_api().breakers is None
+    assert make_api(breaker_threshold=5).breakers is not None
@@ -0,0 +1,77 @@
+from mambu.cache import MISSING, ResponseCache
+from tests.fakes import FakeResponse
+
+
+def _reference(method, url, params):
+    return FakeResponse(200, dict(
+        id=url, encodedKey='key-' + url, params=params))
+
+
+def test_reference_data_is_cached(api_with_responses):
+    api, sent = api_with_responses(_reference, cache_maxsize=2)
+    first = api.get_loan_product('salary_advance')
+    first['id'] = 'mutated'
+    assert api.get_loan_product('salary_advance')['id'] == \
+        'loanproducts/salary_advance'
+    assert api.get_loan_product_encoded_key('salary_advance') == \
+        'key-loanproducts/salary_advance'
+    assert len(sent) == 1
+    assert api.cache.stats() == dict(hits=2, misses=1, size=1, maxsize=2)
+
+
+def test_cache_keyed_on_params(api_with_responses):
+    api, sent = api_with_responses(_reference, cache_maxsize=2)
+    api.get_custom_field_sets('CLIENT_INFO')
+    api.get_custom_field_sets('LOAN_ACCOUNT_INFO')
+    api.get_custom_field_sets('CLIENT_INFO')
+    assert len(sent) == 2
+
+
+def test_other_endpoints_not_cached(api_with_responses):
+    api, sent = api_with_responses(_reference, cache_maxsize=2)
+    api.get_loan('1')
+    api.get_loan('1')
+    assert len(sent) == 2
+
+
+def test_write_invalidates_endpoint(api_with_responses):
+    api, sent = api_with_responses(_reference, cache_maxsize=2)
+    api.get_custom_field('c_marital_status')
+    api._delete('customfields/c_marital_status')
+    api.get_custom_field('c_marital_status')
+    assert [s[0] for s in sent] == ['get', 'delete', 'get']
+
+
+def test_write_during_get_not_overwritten(api_with_responses):
+    def _response(method, url, params):
+        if len(sent) == 1:
+            # a write to the endpoint completes while the read is in flight
+            api.cache.invalidate('loanproducts')
+        return _reference(method, url, params)
+    api, sent = api_with_responses(_response, cache_maxsize=2)
+    api.get_loan_product('salary_advance')
+    api.get_loan_product('salary_advance')
+    assert len(sent) == 2
+    assert api.cache.stats()['size'] == 1
+
+
+def test_cache_disabled_by_default(api_with_responses):
+    api, sent = api_with_responses(_reference)
+    assert api.cache is None
+    api.get_loan_product('salary_advance')
+    api.get_loan_product('salary_advance')
+    assert len(sent) == 2
+
+
+def test_response_cache_lru_and_ttl():
+    cache = ResponseCache(maxsize=2)
+    cache.set(('a', 'a/1', ()), 1, 60)
+    cache.set(('a', 'a/2', ()), 2, 60)
+    assert cache.get(('a', 'a/1', ())) == 1
+    cache.set(('b', 'b/1', ()), 3, 60)
+    assert cache.get(('a', 'a/2', ())) is MISSING
+    cache.set(('b', 'b/2', ()), 4, -1)
+    assert cache.get(('b', 'b/2', ())) is MISSING
+    cache.invalidate('a')
+    assert cache.get(('a', 'a/1', ())) is MISSING
+    assert cache.get(('b', 'b/1', ())) == 3
@@ -0,0 +1,48 @@
+import pytest
+
+from mambu.api import API
+from mambu.cassette import Cassette, CassetteError, ReplayedResponse
+from mambu.cassette import request_key
+from mambu.config import Config
+from tests.fakes import FakeResponse
+
+
+def test_request_key_ignores_body_key_order():
+    assert request_key('post', '/loans', {'a': 1}, '{"x": 1, "y": 2}') == \
+        request_key('POST', '/loans', {'a': '1'}, '{"y": 2, "x": 1}')
+
+
+def test_record_then_replay(standin, tmpdir, user_dict):
+    path = str(tmpdir.join('mambu.cassette'))
+    with API(standin.config(cassette=path, cassette_mode='record')) as api:
+        client = api.create_client(user_dict)['client']
+        fetched = api.get_client(client['id'])
+        loans = list(api.iter_loans(page_size=2))
+
+    before = standin.request_count
+    config = Config()
+    config.domain = 'unreachable.invalid'
+    config.username = config.password = 'replay'
+    config.cassette = path
+    config.cassette_mode = 'replay'
+    with API(config) as api:
+        assert api.create_client(user_dict)['client'] == client
+        assert api.get_client(client['id']) == fetched
+        assert list(api.iter_loans(page_size=2)) == loans
+        with pytest.raises(CassetteError):
+            api.get_client('not-recorded')
+    assert standin.request_count == before
+
+
+def test_binary_bodies_recorded(tmpdir):
+    path = str(tmpdir.join('binary.cassette'))
+    content = b'\x89PNG\r\n\x1a\n\xff\xfe'
+    cassette = Cassette(path, 'record')
+    cassette.record('get', 'documents/1', None, None,
+                    FakeResponse(200, headers={'Content-Type': 'image/png'}))
+    cassette.record('get', 'documents/2', None, None, ReplayedResponse(
+        200, {'Content-Type': 'image/png'}, content))
+    cassette.close()
+    replay = Cassette(path, 'replay')
+    assert replay.play('get', 'documents/1', None, None).content == '{}'
+    assert replay.play('get', 'documents/2', None, None).content == content
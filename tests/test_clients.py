@@ -75,3 +75,9 @@ def test_custom_value(mambuapi, user_in_mambu):
     assert result['returnCode'] == 0
     old_client = mambuapi.get_client_full_details(client_id)
     assert old_client['customInformation'] == []
+
+
+@pytest.mark.slow
+def test_iter_clients(mambuapi, user_in_mambu_id):
+    client_ids = [c['id'] for c in mambuapi.iter_clients(page_size=5)]
+    assert user_in_mambu_id in client_ids
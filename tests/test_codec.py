@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import datetime
+import json
+
+import pytest
+
+from mambu import codec
+from mambu.api import RequestJSONEncoder
+
+
+def _chunks(text, size):
+    return [text[n:n + size] for n in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 4096])
+def test_iter_json_array_any_chunking(size):
+    items = [dict(id=n, name=u'Zo\xeb' * n, amounts=[1.5, None, True])
+             for n in range(20)] + [1234567, u'last']
+    text = json.dumps(items, ensure_ascii=False).encode('utf-8')
+    assert list(codec.iter_json_array(_chunks(text, size))) == items
+
+
+def test_iter_json_array_empty_and_whitespace():
+    assert list(codec.iter_json_array(['  [', ' ] '])) == []
+    assert list(codec.iter_json_array([' [ 1 ,', '2 ] '])) == [1, 2]
+
+
+def test_iter_json_array_errors():
+    with pytest.raises(ValueError):
+        list(codec.iter_json_array(['{"id": 1}']))
+    with pytest.raises(ValueError):
+        list(codec.iter_json_array(['[{"id": 1}, {"id"']))
+
+
+def test_iter_json_array_is_lazy():
+    consumed = []
+
+    def chunks():
+        for chunk in ['[{"id": 1},', ' {"id": 2}', ']']:
+            consumed.append(chunk)
+            yield chunk
+    items = codec.iter_json_array(chunks())
+    assert next(items) == dict(id=1)
+    assert len(consumed) == 1
+
+
+@pytest.mark.parametrize('name', ['json', 'simplejson', 'ujson'])
+def test_codecs_round_trip(name):
+    try:
+        _codec = codec.get_codec(name, RequestJSONEncoder().default)
+    except ImportError:
+        pytest.skip('{} not installed'.format(name))
+    body = dict(date=datetime.date(2015, 4, 25), amount=10.5)
+    assert _codec.decode(_codec.encode(body)) == dict(
+        date='2015-04-25', amount=10.5)
+
+
+@pytest.mark.parametrize('name', ['json', 'simplejson', 'ujson'])
+def test_codecs_keep_amounts_exact(name):
+    try:
+        _codec = codec.get_codec(name)
+    except ImportError:
+        pytest.skip('{} not installed'.format(name))
+    amounts = [0.3, 0.1, 1234.5678, 99999999.99, 2 ** 64]
+    text = _codec.encode(dict(amounts=amounts))
+    assert _codec.decode(text) == dict(amounts=amounts)
+    assert list(codec.iter_json_array([_codec.encode(amounts)], _codec)) == (
+        amounts)
+    assert repr(_codec.decode('0.3')) == '0.3'
+
+
+def test_auto_codec_is_not_ujson():
+    assert codec.get_codec('auto').name in ('simplejson', 'json')
+
+
+def test_codec_from_config(make_api):
+    assert make_api(json_codec='json').codec.name == 'json'
+    with pytest.raises(ValueError):
+        codec.get_codec('yaml')
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from mambu.exception import MambuAPIException, MambuBatchException
+
+
+def _custom_fields(api, names):
+    return [api.ClientCustomField(customFieldID=name, value=name.upper())
+            for name in names]
+
+
+def test_set_client_list_custom_field_results(monkeypatch, make_api):
+    api = make_api(max_workers=3)
+    threads = set()
+
+    def set_client_custom_field(client_id, custom_field_id, value):
+        threads.add(threading.current_thread().name)
+        return dict(returnCode=0, field=custom_field_id, value=value)
+    monkeypatch.setattr(
+        api, 'set_client_custom_field', set_client_custom_field)
+    names = ['f{}'.format(n) for n in range(10)]
+    results = api.set_client_list_custom_field(
+        '1', _custom_fields(api, names))
+    assert [r['field'] for r in results] == names
+    assert len(threads) <= 3
+
+
+def test_set_client_list_custom_field_aggregates_errors(monkeypatch, make_api):
+    api = make_api(max_workers=3)
+
+    def set_client_custom_field(client_id, custom_field_id, value):
+        if custom_field_id == 'bad':
+            raise MambuAPIException('Error', 400, dict(returnCode=4))
+        return dict(returnCode=0)
+    monkeypatch.setattr(
+        api, 'set_client_custom_field', set_client_custom_field)
+    with pytest.raises(MambuBatchException) as exc:
+        api.set_client_list_custom_field(
+            '1', _custom_fields(api, ['good', 'bad', 'good']))
+    assert exc.value.results == [dict(returnCode=0), None, dict(returnCode=0)]
+    assert list(exc.value.errors) == [1]
+    assert exc.value.errors[1].code == 400
+
+
+def test_fan_out_from_worker_runs_inline(make_api):
+    api = make_api(max_workers=3)
+    nested = api.executor.apply_async(
+        api._fan_out, (lambda n: n + 1, [(n,) for n in range(10)], 'nested'))
+    assert nested.get(timeout=5) == list(range(1, 11))
+
+
+def test_bulk_loan_transactions_in_order(monkeypatch, make_api):
+    api = make_api(max_workers=3)
+
+    def _post_loan_transaction(loan_id, loan_transaction):
+        if loan_id == 'bad':
+            raise MambuAPIException('Error', 400, dict(returnCode=4))
+        return dict(loan=loan_id, type=loan_transaction['type'])
+    monkeypatch.setattr(api, '_post_loan_transaction', _post_loan_transaction)
+    ids = ['l{}'.format(n) for n in range(20)]
+    ids[7] = 'bad'
+    results = list(api.bulk_loan_transactions(
+        (loan_id, dict(type='APPROVAL')) for loan_id in ids))
+    assert [r.index for r in results] == list(range(20))
+    assert [r.ok for r in results].count(False) == 1
+    assert results[7].error.code == 400
+    assert results[8].result == dict(loan='l8', type='APPROVAL')
+
+
+def test_bulk_consumes_input_lazily(monkeypatch, make_api):
+    api = make_api(max_workers=3)
+    monkeypatch.setattr(api, 'create_loan', lambda loan: loan)
+    consumed = []
+
+    def loans():
+        for n in range(100):
+            consumed.append(n)
+            yield dict(id=n)
+    results = api.bulk_create_loans(loans())
+    assert next(results).result == dict(id=0)
+    assert len(consumed) <= 2 * 3
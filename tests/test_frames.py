@@ -0,0 +1,52 @@
+import pytest
+
+from mambu import frames
+
+
+LOANS = [
+    dict(id='A1', encodedKey='k1', accountState='ACTIVE', loanAmount='1200',
+         creationDate='2015-09-01T10:00:00+0000',
+         tranches=[
+             dict(encodedKey='t1', amount='400',
+                  expectedDisbursementDate='2015-09-04T00:00:00',
+                  disbursementTransactionKey='x1'),
+             dict(encodedKey='t2', amount='800',
+                  expectedDisbursementDate='2015-09-11T00:00:00')]),
+    dict(id='A2', encodedKey='k2', accountState='APPROVED', loanAmount='50.5',
+         tranches=[])]
+
+
+def test_loans_frame_is_typed():
+    frame = frames.loans_frame(iter(LOANS))
+    assert list(frame['id']) == ['A1', 'A2']
+    assert frame['loanAmount'].dtype == float
+    assert frame['loanAmount'].sum() == 1250.5
+    assert str(frame['accountState'].dtype) == 'category'
+    assert str(frame['creationDate'].dtype) == 'datetime64[ns, UTC]'
+    assert frame['creationDate'].isnull().tolist() == [False, True]
+    assert frame['principalBalance'].isnull().all()
+
+
+def test_loans_frame_explodes_tranches():
+    frame = frames.loans_frame(iter(LOANS), tranches=True)
+    assert list(frame['id']) == ['A1', 'A1']
+    assert list(frame['tranche_amount']) == [400.0, 800.0]
+    assert list(frame['tranche_disbursed']) == [True, False]
+    assert frame['tranche_expectedDisbursementDate'].dt.day.tolist() == [4, 11]
+
+
+def test_empty_frame_has_columns():
+    frame = frames.transactions_frame([])
+    assert len(frame) == 0
+    assert list(frame.columns) == [n for n, _ in frames.TRANSACTION_COLUMNS]
+
+
+@pytest.mark.slow
+def test_loans_and_transactions_to_frame(mambuapi, approved_loan):
+    loan_id = approved_loan['id']
+    mambuapi.disburse(loan_id)
+    loans = mambuapi.loans_to_frame(page_size=5)
+    assert loan_id in set(loans['id'])
+    transactions = mambuapi.transactions_to_frame(loan_id)
+    assert 'DISBURSMENT' in set(transactions['type'])
+    assert transactions['amount'].dtype == float
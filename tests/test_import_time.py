@@ -0,0 +1,65 @@
+"""Import time benchmark for short lived processes importing mambu"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from mambu import metadata
+
+
+# seconds allowed for a fresh interpreter to import mambu, overridden by the
+# MAMBU_IMPORT_TIME_TARGET environment variable e.g. on slow CI machines
+IMPORT_TIME_TARGET = float(os.environ.get('MAMBU_IMPORT_TIME_TARGET', 1.0))
+
+SCRIPT = """
+import json, sys, time
+started = time.time()
+import mambu
+print(json.dumps(dict(seconds=time.time() - started, modules=sorted(
+    m for m in ('pandas', 'numpy', 'dateutil', 'yaml') if m in sys.modules))))
+"""
+
+
+def _import_mambu():
+    return json.loads(subprocess.check_output([sys.executable, '-c', SCRIPT]))
+
+
+@pytest.fixture(scope='module')
+def compiled_metadata():
+    return metadata.compile_metadata()
+
+
+def test_import_is_lazy(compiled_metadata):
+    assert _import_mambu()['modules'] == []
+
+
+@pytest.mark.slow
+def test_import_time_under_target(compiled_metadata):
+    seconds = min(_import_mambu()['seconds'] for _ in range(3))
+    assert seconds < IMPORT_TIME_TARGET, \
+        'importing mambu took {:.3f}s, the target is {}s'.format(
+            seconds, IMPORT_TIME_TARGET)
+
+
+def test_metadata_cached_in_cache_dir(compiled_metadata, metadata_cache):
+    assert os.path.dirname(compiled_metadata) == metadata_cache
+    assert os.path.basename(compiled_metadata) == \
+        'data-{}.pickle'.format(metadata.cache_key())
+
+
+def test_cached_metadata_matches_yaml(compiled_metadata):
+    assert metadata.load_metadata() == metadata.parse_metadata()
+
+
+def test_stale_caches_pruned(compiled_metadata):
+    directory = os.path.dirname(compiled_metadata)
+    stale = os.path.join(directory, 'data-0123456789abcdef.pickle')
+    other = os.path.join(directory, 'notes.txt')
+    for path in (stale, other):
+        open(path, 'w').close()
+    assert metadata.compile_metadata() == compiled_metadata
+    assert not os.path.exists(stale)
+    assert os.path.exists(other)
+    os.unlink(other)
@@ -1,4 +1,7 @@
 import pytest
+import requests
+
+from mambu.api import API
 
 
 @pytest.mark.slow
@@ -81,3 +84,34 @@ def test_disburse_set_repayment(mambuapi, approved_loan):
     mambuapi.disburse(loan_id, first_repayment_date='2015-09-25')
     loans = mambuapi.get_repayments_due_on_date('2015-09-25')
     assert loan_id in map(lambda x: x['id'], loans)
+
+
+def _lose_first_response(api):
+    """Make the first request sent by api reach mambu but fail as if the
+    connection dropped before the response arrived"""
+    send = api._send
+    calls = []
+
+    def _send(*args, **kwargs):
+        calls.append(args)
+        response = send(*args, **kwargs)
+        if len(calls) == 1:
+            raise requests.ConnectionError('connection reset')
+        return response
+    api._send = _send
+    return calls
+
+
+@pytest.mark.slow
+def test_lost_repayment_reconciled_not_reposted(standin, approved_loan):
+    loan_id = approved_loan['id']
+    with API(standin.config(retry_backoff=0.001,
+                                idempotent_transactions=True)) as api:
+        api.disburse(loan_id)
+        before = len(api.get_transactions(loan_id))
+        calls = _lose_first_response(api)
+        result = api.repayment(loan_id, 100, notes='standing order')
+        assert result['type'] == 'REPAYMENT'
+        assert result['comment'].startswith('standing order idempotency-key:')
+        assert len(api.get_transactions(loan_id)) == before + 1
+        assert calls[0][2]['Idempotency-Key'] in result['comment']
@@ -1,3 +1,6 @@
+from datetime import date
+from decimal import Decimal
+
 import pytest
 
 from mambu.tools import datelib
@@ -86,10 +89,18 @@ def test_get_disbursements_due_today(mambuapi):
 
 
 @pytest.mark.slow
-def test_get_disbursements_due_on_date(mambuapi, unapproved_loan):
-    test_date = unapproved_loan['expectedDisbursementDate']
+def test_get_disbursements_due_on_date(mambuapi, approved_loan):
+    test_date = approved_loan['expectedDisbursementDate']
     loans = mambuapi.get_disbursements_due_on_date(test_date)
-    assert len(loans) > 0
+    assert approved_loan['id'] in [l['loanId'] for l in loans]
+
+
+@pytest.mark.slow
+def test_get_disbursements_due_on_date_ignores_pending_approval(
+        mambuapi, unapproved_loan):
+    loans = mambuapi.get_disbursements_due_on_date(
+        unapproved_loan['expectedDisbursementDate'])
+    assert unapproved_loan['id'] not in [l['loanId'] for l in loans]
 
 
 @pytest.mark.slow
@@ -135,4 +146,60 @@ def test_get_transactions(mambuapi, approved_loan):
 def test_get_loan_full_details(mambuapi, approved_loan):
     loan_id = approved_loan['id']
     response = mambuapi.get_loan_full_details(loan_id)
-    assert response['id'] == loan_id
\ No newline at end of file
+    assert response['id'] == loan_id
+
+
+@pytest.mark.slow
+def test_iter_loans(mambuapi, unapproved_loan):
+    loan_id = unapproved_loan['id']
+    loan_ids = [loan['id'] for loan in mambuapi.iter_loans(page_size=5)]
+    assert loan_id in loan_ids
+    assert len(loan_ids) == len(set(loan_ids))
+
+
+@pytest.mark.slow
+def test_iter_search(mambuapi, unapproved_loan):
+    loan_id = unapproved_loan['id']
+    filter_constraints = [
+        dict(filterSelection='ACCOUNT_ID', filterElement='EQUALS',
+             value=loan_id)]
+    loans = list(mambuapi.iter_search(filter_constraints, page_size=5))
+    assert [loan['id'] for loan in loans] == [loan_id]
+
+
+@pytest.mark.slow
+def test_forecast_disbursements(mambuapi, loan_dict):
+    dates = ['2015-12-24T00:00:00', '2015-12-25T00:00:00',
+             '2015-12-31T00:00:00']
+    for tranche, day in zip(loan_dict['tranches'], dates):
+        tranche['expectedDisbursementDate'] = day
+    loan_dict['expectedDisbursementDate'] = dates[0]
+    loan_id = mambuapi.create_loan(loan_dict)['loanAccount']['id']
+    mambuapi.approve(loan_id)
+    forecast = mambuapi.forecast_disbursements('2015-12-24', '2015-12-30')
+    assert forecast.keys() == [
+        date(2015, 12, 24), date(2015, 12, 29), date(2015, 12, 30)]
+    ours = dict(
+        (d, [i for i in day['disbursements'] if i['loanId'] == loan_id])
+        for d, day in forecast.items())
+    assert [len(ours[d]) for d in forecast] == [1, 1, 0]
+    assert ours[date(2015, 12, 29)][0]['expectedDisbursementDate'] == dates[1]
+    assert all(day['total'] == sum(i['amount'] for i in day['disbursements'])
+               for day in forecast.values())
+
+
+@pytest.mark.slow
+def test_forecast_counts_days_off_before_start(mambuapi, loan_dict):
+    dates = ['2015-12-26T00:00:00', '2015-12-29T00:00:00',
+             '2016-01-05T00:00:00']
+    for tranche, day in zip(loan_dict['tranches'], dates):
+        tranche['expectedDisbursementDate'] = day
+    loan_dict['expectedDisbursementDate'] = dates[0]
+    loan_id = mambuapi.create_loan(loan_dict)['loanAccount']['id']
+    mambuapi.approve(loan_id)
+    forecast = mambuapi.forecast_disbursements('2015-12-29', '2015-12-29')
+    assert forecast.keys() == [date(2015, 12, 29)]
+    ours = [i for i in forecast[date(2015, 12, 29)]['disbursements']
+            if i['loanId'] == loan_id]
+    assert [i['expectedDisbursementDate'] for i in ours] == dates[:2]
+    assert sum(i['amount'] for i in ours) == Decimal('800')
@@ -0,0 +1,78 @@
+from mambu import metrics
+from tests.fakes import FakeResponse
+
+
+def test_template_path():
+    assert metrics.template_path('loans/ABC123/transactions') == \
+        'loans/{id}/transactions'
+    assert metrics.template_path('loans/search') == 'loans/search'
+    assert metrics.template_path(
+        'clients/1/custominformation/c_marital_status/2') == \
+        'clients/{id}/custominformation/{id}/{id}'
+
+
+def test_requests_recorded(api_with_responses):
+    registry = metrics.MetricsRegistry()
+    api, sent = api_with_responses(
+        [FakeResponse(503), FakeResponse(200, [dict(id='1')]),
+         FakeResponse(201, dict(id='2'))],
+        retry_backoff=0, metrics_enabled=True, metrics_registry=registry)
+    api.get_transactions('ABC123')
+    api.approve('DEF456')
+    key = ('GET', 'loans/{id}/transactions')
+    assert registry.requests[key + ('503',)] == 1
+    assert registry.requests[key + ('200',)] == 1
+    assert registry.requests[('POST', 'loans/{id}/transactions', '201')] == 1
+    assert registry.retries[key] == 1
+    assert registry.latency[key].count == 2
+    assert registry.bytes_received[key] == len('{}') + len('[{"id": "1"}]')
+    text = registry.exposition()
+    assert 'mambu_requests_total{method="GET",endpoint=' \
+        '"loans/{id}/transactions",status="200"} 1' in text
+    assert 'mambu_request_duration_seconds_bucket{method="GET",endpoint=' \
+        '"loans/{id}/transactions",le="+Inf"} 2' in text
+    assert 'mambu_retries_total{method="GET",endpoint=' \
+        '"loans/{id}/transactions"} 1' in text
+
+
+def test_histogram_cumulative():
+    histogram = metrics.Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5):
+        histogram.observe(value)
+    assert histogram.cumulative() == [('0.1', 1), ('1.0', 3), ('+Inf', 4)]
+    assert histogram.sum == 6.25
+
+
+def test_gauges_rendered():
+    registry = metrics.MetricsRegistry()
+    registry.set_gauge('mambu_test_state', (('group', 'loans'),), 1)
+    assert 'mambu_test_state{group="loans"} 1' in registry.exposition()
+
+
+def test_metrics_are_opt_in(make_api):
+    assert make_api().metrics is None
+    assert make_api(metrics_enabled=True).metrics is metrics.REGISTRY
+
+
+def test_streamed_bytes_counted_as_read(api_with_responses):
+    registry = metrics.MetricsRegistry()
+    records = [dict(id=str(n)) for n in range(5)]
+    api, sent = api_with_responses(
+        [FakeResponse(200, records)], stream_chunk_size=8,
+        metrics_enabled=True, metrics_registry=registry)
+    assert list(api.iter_loans(page_size=10)) == records
+    assert registry.bytes_received[('GET', 'loans')] == len(
+        FakeResponse(200, records).content)
+
+
+def test_abandoned_stream_counts_bytes_read(api_with_responses):
+    registry = metrics.MetricsRegistry()
+    records = [dict(id=str(n)) for n in range(50)]
+    api, sent = api_with_responses(
+        [FakeResponse(200, records)], stream_chunk_size=8,
+        metrics_enabled=True, metrics_registry=registry)
+    loans = api.iter_loans(page_size=100)
+    assert next(loans) == records[0]
+    loans.close()
+    received = registry.bytes_received[('GET', 'loans')]
+    assert 0 < received < len(FakeResponse(200, records).content)
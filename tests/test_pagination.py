@@ -0,0 +1,149 @@
+import gc
+import json
+import threading
+
+import pytest
+
+from mambu.api import API, MAX_PAGE_SIZE
+from tests.fakes import FakeResponse
+
+
+def _pages(records):
+    def _response(method, url, params):
+        offset, limit = params['offset'], params['limit']
+        return FakeResponse(200, records[offset:offset + limit])
+    return _response
+
+
+def test_iter_loans_walks_pages(api_with_responses):
+    records = [dict(id=str(n)) for n in range(7)]
+    api, sent = api_with_responses(_pages(records), stream_chunk_size=16)
+    assert list(api.iter_loans(page_size=3)) == records
+    assert [request[3]['offset'] for request in sent] == [0, 3, 6]
+    assert all(request[:2] == ('get', 'loans') for request in sent)
+
+
+def test_iter_search_exact_page_boundary(api_with_responses):
+    records = [dict(id=str(n)) for n in range(4)]
+    api, sent = api_with_responses(_pages(records), stream_chunk_size=16)
+    constraints = [dict(filterSelection='ACCOUNT_STATE',
+                        filterElement='EQUALS', value='ACTIVE')]
+    assert list(api.iter_search(constraints, page_size=2)) == records
+    assert len(sent) == 3
+    assert sent[0][:2] == ('post', 'loans/search')
+    assert json.loads(sent[0][4]) == dict(filterConstraints=constraints)
+
+
+def test_iter_pages_is_lazy(api_with_responses):
+    api, sent = api_with_responses(_pages(range(10)))
+    pages = api._iter_pages('get', 'clients', dict(offset=4), page_size=2)
+    assert next(pages) == [4, 5]
+    assert len(sent) == 1
+
+
+def test_iter_refuses_pages_mambu_would_cut_short(api_with_responses):
+    records = [dict(id=str(n)) for n in range(10)]
+    api, sent = api_with_responses(_pages(records))
+    for page_size in (0, MAX_PAGE_SIZE + 1):
+        with pytest.raises(ValueError):
+            list(api.iter_clients(page_size=page_size))
+        with pytest.raises(ValueError):
+            list(api._iter_pages('get', 'clients', page_size=page_size))
+    assert sent == []
+    assert list(api.iter_clients(page_size=MAX_PAGE_SIZE)) == records
+
+
+def test_scan_loans_ordered(api_with_responses):
+    records = [dict(id=str(n)) for n in range(23)]
+    api, sent = api_with_responses(_pages(records), stream_chunk_size=16)
+    result = list(api.scan_loans(page_size=4, concurrency=3, ordered=True))
+    assert result == records
+
+
+def test_scan_clients_unordered(api_with_responses):
+    records = [dict(id=str(n)) for n in range(20)]
+    api, sent = api_with_responses(_pages(records), stream_chunk_size=16)
+    result = list(api.scan_clients(page_size=5, concurrency=2))
+    assert sorted(result, key=lambda r: int(r['id'])) == records
+    assert all(request[:2] == ('get', 'clients') for request in sent)
+
+
+def test_scan_refuses_pages_mambu_would_cut_short(api_with_responses):
+    records = [dict(id=str(n)) for n in range(10)]
+    api, sent = api_with_responses(_pages(records))
+    with pytest.raises(ValueError):
+        list(api.scan_clients(page_size=MAX_PAGE_SIZE + 1))
+    assert sent == []
+    assert list(api.scan_clients(page_size=MAX_PAGE_SIZE)) == records
+
+
+def test_scan_raises_page_errors(monkeypatch, make_api):
+    api = make_api()
+
+    def _request(method, url, params=None, data=None, idempotent=None):
+        if params['offset'] == 2:
+            raise ValueError('page failed')
+        return [params['offset'], params['offset'] + 1]
+    monkeypatch.setattr(api, '_request', _request)
+    try:
+        list(api.scan_savings(page_size=2, concurrency=2, ordered=True))
+    except ValueError as e:
+        assert str(e) == 'page failed'
+    else:
+        assert False, 'expected the page error to be raised'
+
+
+def test_scan_stopped_early_skips_queued_pages(monkeypatch, make_api):
+    api = make_api(max_workers=1)
+    release = threading.Event()
+    requested = []
+
+    def _request(method, url, params=None, data=None, idempotent=None):
+        requested.append(params['offset'])
+        if params['offset'] != 0:
+            release.wait(5)
+        return [params['offset'], params['offset'] + 1]
+    monkeypatch.setattr(api, '_request', _request)
+    pages = api._scan_pages('get', 'clients', page_size=2, concurrency=3)
+    assert next(pages) == [0, 1]
+    pages.close()
+    release.set()
+    api.close()
+    assert requested in ([0], [0, 2])
+
+
+def test_iter_loans_decodes_incrementally(monkeypatch, make_api):
+    api = make_api(stream_chunk_size=16)
+    records = [dict(id=str(n)) for n in range(5)]
+    sent = []
+
+    def _send(method, url, headers, params, data_str, stream=False):
+        sent.append(stream)
+        response = FakeResponse(200, records)
+        response.content = None
+        response.iter_content = lambda size: (
+            FakeResponse(200, records).iter_content(size))
+        return response
+    monkeypatch.setattr(api, '_send', _send)
+    assert list(api.iter_loans(page_size=10)) == records
+    assert sent == [True]
+
+
+def test_abandoned_iteration_releases_connection(standin, user_dict):
+    config = standin.config(pool_maxsize=1, pool_block=True,
+                            stream_chunk_size=16, coalesce_reads=False)
+    with API(config) as api:
+        for n in range(5):
+            api.create_client(dict(user_dict, lastName='Abandon{}'.format(n)))
+        records = api.iter_clients(page_size=50)
+        for _ in range(3):
+            next(records)
+        del records
+        gc.collect()
+        done = []
+        thread = threading.Thread(
+            target=lambda: done.append(api.get_loan_product('salary_advance')))
+        thread.daemon = True
+        thread.start()
+        thread.join(5)
+        assert done, 'request blocked waiting for the only pooled connection'
@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from mambu import replica as replica_module
+from mambu.api import API
+from mambu.replica import Replica
+
+
+@pytest.fixture(scope='function')
+def replica(mambuapi):
+    with Replica(mambuapi) as _replica:
+        yield _replica
+
+
+@pytest.mark.slow
+def test_sync_and_query(mambuapi, replica, approved_loan, loan_dict):
+    counts = replica.sync()
+    assert counts['loans'] >= 1
+    assert replica.checkpoint('loans') is not None
+    loan = replica.get_loan(approved_loan['id'])
+    assert loan['encodedKey'] == approved_loan['encodedKey']
+    assert replica.get_client(loan['accountHolderKey'])['encodedKey'] == \
+        loan['accountHolderKey']
+    assert replica.get_disbursements_due_on_date(
+        loan_dict['tranches'][0]['expectedDisbursementDate']) == \
+        mambuapi.get_disbursements_due_on_date(
+            loan_dict['tranches'][0]['expectedDisbursementDate'])
+    assert approved_loan['id'] in [l['id'] for l in
+                                   replica.get_repayments_due_on_date(
+                                       loan_dict['firstRepaymentDate'])]
+
+
+@pytest.mark.slow
+def test_incremental_sync_only_requests_changes(standin, loan_dict):
+    with API(standin.config()) as api, Replica(api) as replica:
+        loan = api.create_loan(loan_dict)['loanAccount']
+        replica.sync()
+        api.approve(loan['id'])
+        before = standin.request_count
+        replica.sync()
+        searches = [path for _, path in standin.requests_since(before)]
+        assert searches[:2] == ['/api/loans/search', '/api/clients/search']
+        assert replica.get_loan(loan['id'])['accountState'] == 'APPROVED'
+        assert loan['id'] in [
+            l['id'] for l in replica.get_loans(account_state='APPROVED')]
+
+
+@pytest.mark.slow
+def test_full_sync_drops_deleted_records(mambuapi, replica, unapproved_loan):
+    replica.sync(entities=['loans'])
+    mambuapi.delete_loan(unapproved_loan['id'])
+    replica.sync(entities=['loans'])
+    assert replica.get_loan(unapproved_loan['id']) is not None
+    replica.sync(full=True, entities=['loans'])
+    assert replica.get_loan(unapproved_loan['id']) is None
+
+
+def test_queries_answered_while_syncing(monkeypatch, make_api):
+    monkeypatch.setattr(replica_module, 'SYNC_BATCH_SIZE', 2)
+    answered = []
+    api = make_api()
+    with Replica(api) as replica:
+        def iter_loans():
+            for n in range(5):
+                if n == 3:
+                    thread = threading.Thread(target=lambda: answered.append(
+                        [l['id'] for l in replica.get_loans()]))
+                    thread.start()
+                    thread.join(5)
+                yield dict(encodedKey='k{}'.format(n), id=str(n),
+                           lastModifiedDate='2040-01-0{}'.format(n + 1))
+        monkeypatch.setattr(api, 'iter_loans', iter_loans)
+        assert replica.sync(entities=['loans']) == dict(loans=5)
+        assert answered == [['0', '1']]
+        assert replica.checkpoint('loans') == '2040-01-05'
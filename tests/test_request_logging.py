@@ -0,0 +1,34 @@
+import logging
+
+from tests.fakes import FakeResponse
+
+
+def test_request_logged_lazily(api_with_responses, caplog, capsys):
+    api, sent = api_with_responses([FakeResponse(201, dict(id='1'))])
+    with caplog.at_level(logging.DEBUG, logger='mambu.api.requests'):
+        api.create_loan(dict(loanAmount='1200'))
+    records = [r for r in caplog.records if r.name == 'mambu.api.requests']
+    assert len(records) == 1
+    record = records[0]
+    assert record.mambu_path == 'loans'
+    assert record.mambu_status == 201
+    assert record.mambu_bytes_received == len('{"id": "1"}')
+    assert '1200' not in record.getMessage()
+    assert capsys.readouterr().out == ''
+
+
+def test_request_bodies_logged_when_enabled(api_with_responses, caplog):
+    api, sent = api_with_responses([FakeResponse(201, dict(id='1'))],
+                                   log_bodies=True, log_body_max=20)
+    with caplog.at_level(logging.DEBUG, logger='mambu.api.requests'):
+        api.create_loan(dict(loanAmount='1200', notes='x' * 100))
+    messages = [r.getMessage() for r in caplog.records]
+    body = [m for m in messages if 'request body' in m][0]
+    assert len(body.split('request body: ')[1]) == 20
+
+
+def test_nothing_logged_when_disabled(api_with_responses, caplog):
+    api, sent = api_with_responses([FakeResponse(201, dict(id='1'))])
+    with caplog.at_level(logging.INFO, logger='mambu.api.requests'):
+        api.get_loan('1')
+    assert not [r for r in caplog.records if r.name == 'mambu.api.requests']
@@ -0,0 +1,141 @@
+import json
+import time
+
+import pytest
+import requests
+
+from mambu import retry
+from mambu.exception import MambuAPIException
+from tests.fakes import FakeResponse
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    _sleeps = []
+    monkeypatch.setattr('time.sleep', _sleeps.append)
+    return _sleeps
+
+
+def _methods(sent):
+    return [request[0] for request in sent]
+
+
+def test_retry_after_is_honoured(api_with_responses, sleeps):
+    api, sent = api_with_responses([
+        FakeResponse(429, headers={'Retry-After': '2'}),
+        FakeResponse(200, [1])])
+    assert api.get_loan() == [1]
+    assert sleeps == [2.0]
+    assert len(sent) == 2
+
+
+def test_transient_errors_retried_for_get(api_with_responses, sleeps):
+    api, sent = api_with_responses([
+        FakeResponse(503), requests.ConnectionError(), FakeResponse(200, {})],
+        retry_backoff=0.01)
+    assert api.get_client('1') == {}
+    assert len(sleeps) == 2
+    assert all(0 <= s <= 0.02 for s in sleeps)
+
+
+def test_post_not_retried_on_server_error(api_with_responses, sleeps):
+    api, sent = api_with_responses([
+        FakeResponse(500, {'returnCode': 1}), FakeResponse(201, {})])
+    with pytest.raises(MambuAPIException) as exc:
+        api.create_client({})
+    assert exc.value.code == 500
+    assert _methods(sent) == ['post']
+    assert sleeps == []
+
+
+def test_transaction_reposted_after_reconciling(api_with_responses, sleeps):
+    api, sent = api_with_responses([
+        FakeResponse(500, {'returnCode': 1}),
+        FakeResponse(200, {'accountState': 'PENDING_APPROVAL'}),
+        FakeResponse(201, {'accountState': 'APPROVED'})],
+        idempotent_transactions=True)
+    assert api.approve('1') == {'accountState': 'APPROVED'}
+    assert _methods(sent) == ['post', 'get', 'post']
+    assert len(sleeps) == 1
+
+
+def test_state_change_reconciled_from_account(api_with_responses, sleeps):
+    api, sent = api_with_responses([
+        requests.ConnectionError(),
+        FakeResponse(200, {'id': '1', 'accountState': 'APPROVED'})],
+        idempotent_transactions=True)
+    assert api.approve('1') == {'id': '1', 'accountState': 'APPROVED'}
+    assert _methods(sent) == ['post', 'get']
+
+
+@pytest.mark.parametrize('order', [1, -1], ids=['oldest', 'newest'])
+def test_reconcile_finds_transaction_in_any_order(api_with_responses, sleeps,
+                                                  monkeypatch, order):
+    monkeypatch.setattr('uuid.uuid4', lambda: 'key-1')
+    applied = {'type': 'REPAYMENT', 'notes': 'idempotency-key:key-1',
+               'creationDate': '2015-10-16T12:00:00+0000'}
+    transactions = [{'type': 'REPAYMENT', 'notes': 'earlier',
+                     'creationDate': '2014-01-01T12:00:00+0000'}, applied]
+    api, sent = api_with_responses([
+        FakeResponse(502), FakeResponse(200, transactions[::order])],
+        idempotent_transactions=True)
+    assert api.repayment('1', 100) == applied
+    assert _methods(sent) == ['post', 'get']
+    assert json.loads(sent[0][4])['notes'] == 'idempotency-key:key-1'
+
+
+def test_reconcile_reposts_when_not_applied(api_with_responses, sleeps):
+    api, sent = api_with_responses([
+        FakeResponse(502),
+        FakeResponse(200, [{'type': 'REPAYMENT', 'notes': 'earlier',
+                            'creationDate': '2015-10-16T12:00:00+0000'}]),
+        FakeResponse(201, {'type': 'REPAYMENT'})],
+        idempotent_transactions=True)
+    assert api.repayment('1', 100) == {'type': 'REPAYMENT'}
+    assert _methods(sent) == ['post', 'get', 'post']
+
+
+def test_transactions_posted_once_by_default(api_with_responses, sleeps):
+    api, sent = api_with_responses([FakeResponse(500, {'returnCode': 1})])
+    with pytest.raises(MambuAPIException):
+        api.repayment('1', 100, notes='standing order')
+    assert len(sent) == 1
+    assert 'Idempotency-Key' not in sent[0][2]
+    assert 'idempotency-key' not in sent[0][4]
+
+
+def test_retries_exhausted(api_with_responses, sleeps):
+    api, sent = api_with_responses([FakeResponse(502) for _ in range(4)])
+    with pytest.raises(MambuAPIException):
+        api.get_loan('1')
+    assert len(sent) == 4
+
+
+def test_parse_retry_after_http_date():
+    now = 1445000000.0
+    header = 'Fri, 16 Oct 2015 12:53:40 GMT'
+    assert retry.parse_retry_after(header, now=now) == 20.0
+    assert retry.parse_retry_after('garbage') is None
+
+
+def test_tenant_rate_limiter_shared():
+    bucket = retry.tenant_rate_limiter('tenant.mambu.com', 5)
+    assert retry.tenant_rate_limiter('tenant.mambu.com', 5) is bucket
+    bucket.acquire()
+    assert retry.tenant_rate_limiter('tenant.mambu.com', 10, 2) is bucket
+    assert (bucket.rate, bucket.capacity) == (10.0, 2.0)
+    assert bucket.tokens <= 2.0
+
+
+def test_retry_after_capped_at_backoff_max():
+    policy = retry.RetryPolicy(backoff_max=5.0)
+    assert policy.delay(0, '2') == 2.0
+    assert policy.delay(0, '3600') == 5.0
+
+
+def test_token_bucket_waits_when_empty():
+    bucket = retry.TokenBucket(100, burst=1)
+    start = time.time()
+    bucket.acquire()
+    bucket.acquire()
+    assert time.time() - start >= 0.009
@@ -6,3 +6,16 @@ def test_transactions(mambuapi):
     savings = mambuapi.get_savings(None)
     if len(savings) > 0:
         assert mambuapi.get_savings_transactions(savings[0]['id']) is not None
+
+
+@pytest.mark.slow
+def test_create_savings_transaction(mambuapi, user_in_mambu):
+    savings = mambuapi.create_savings(dict(
+        accountHolderKey=user_in_mambu['client']['encodedKey']))
+    savings_id = savings['savingsAccount']['id']
+    result = mambuapi.create_savings_transaction(
+        savings_id, dict(type='DEPOSIT', amount=100))
+    assert result['type'] == 'DEPOSIT'
+    assert result['balance'] == '100'
+    assert mambuapi.get_savings_transactions(savings_id)[0]['encodedKey'] == \
+        result['encodedKey']
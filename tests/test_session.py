@@ -0,0 +1,19 @@
+from mambu.config import Config
+
+
+def test_session_pool_from_config(make_api):
+    api = make_api(pool_connections=2, pool_maxsize=25,
+                   keep_alive=False)
+    adapter = api.session.get_adapter(api.base_url)
+    assert adapter._pool_connections == 2
+    assert adapter._pool_maxsize == 25
+    assert api.session.headers['Connection'] == 'close'
+
+
+def test_session_defaults_for_bare_config(make_api):
+    class BareConfig(object):
+        domain = 'example.mambu.com'
+    api = make_api(BareConfig())
+    adapter = api.session.get_adapter(api.base_url)
+    assert adapter._pool_maxsize == Config.pool_maxsize
+    assert api.session.headers['Connection'] != 'close'
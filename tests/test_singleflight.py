@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from mambu.singleflight import SingleFlight
+
+
+def _run_concurrently(fn, n):
+    results = [None] * n
+
+    def run(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    return threads, results
+
+
+def test_identical_gets_coalesced(monkeypatch, make_api):
+    api = make_api(coalesce_reads=True)
+    release = threading.Event()
+    sent = []
+
+    def _perform(method, url, params=None, data=None, idempotent=None):
+        sent.append(url)
+        release.wait(5)
+        return dict(id='1', tranches=[])
+    monkeypatch.setattr(api, '_perform', _perform)
+    threads, results = _run_concurrently(lambda: api.get_client('1'), 5)
+    while api.single_flight.coalesced < 4:
+        time.sleep(0.001)
+    release.set()
+    [t.join() for t in threads]
+    assert sent == ['clients/1']
+    assert all(r == dict(id='1', tranches=[]) for r in results)
+    assert len(set(id(r['tranches']) for r in results)) == 5
+
+
+def test_writes_not_coalesced(monkeypatch, make_api):
+    api = make_api(coalesce_reads=True)
+    sent = []
+    monkeypatch.setattr(api, '_perform',
+                        lambda *args, **kwargs: sent.append(args))
+    api.approve('1')
+    api.approve('1')
+    assert len(sent) == 2
+
+
+def test_list_params_coalesced(monkeypatch, make_api):
+    api = make_api(coalesce_reads=True)
+    sent = []
+
+    def _perform(method, url, params=None, data=None, idempotent=None):
+        sent.append(params)
+        return []
+    monkeypatch.setattr(api, '_perform', _perform)
+    assert api._get('loans', dict(accountState=['APPROVED', 'ACTIVE'])) == []
+    assert sent == [dict(accountState=['APPROVED', 'ACTIVE'])]
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError('failed')
+    threads, results = _run_concurrently(lambda: flight.do('key', fail), 3)
+    while flight.coalesced < 2:
+        time.sleep(0.001)
+    release.set()
+    [t.join() for t in threads]
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.calls == {}
+    with pytest.raises(KeyError):
+        flight.do('key', lambda: {}['missing'])
+
+
+def test_single_flight_leader_interrupted():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def interrupt():
+        release.wait(5)
+        raise KeyboardInterrupt()
+    leader, _ = _run_concurrently(
+        lambda: _interrupted(lambda: flight.do('key', interrupt)), 1)
+    while 'key' not in flight.calls:
+        time.sleep(0.001)
+    threads, results = _run_concurrently(
+        lambda: _interrupted(lambda: flight.do('key', dict)), 2)
+    while flight.coalesced < 2:
+        time.sleep(0.001)
+    release.set()
+    [t.join(5) for t in leader + threads]
+    assert all(isinstance(r, KeyboardInterrupt) for r in results)
+    assert flight.calls == {}
+
+
+def _interrupted(fn):
+    try:
+        fn()
+    except KeyboardInterrupt as e:
+        return e
+
+
+def test_coalescing_is_opt_in(make_api):
+    assert make_api().single_flight is None
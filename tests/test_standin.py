@@ -0,0 +1,94 @@
+import pytest
+
+from mambu.api import API
+from mambu.exception import MambuAPIException
+from mambu.standin import MambuState, StandInError, StandInMambu
+
+
+@pytest.fixture(scope='function')
+def fast_retry_api(standin):
+    with API(standin.config(retry_backoff=0.001)) as api:
+        yield api
+
+
+def test_injected_throttling_is_retried(standin, fast_retry_api):
+    standin.inject(429, count=2, retry_after=0)
+    before = standin.request_count
+    assert fast_retry_api.get_loan_product('salary_advance')['id'] == \
+        'salary_advance'
+    assert standin.request_count - before == 3
+
+
+def test_injected_server_error_not_retried_for_post(
+        standin, fast_retry_api, loan_dict):
+    standin.inject(500)
+    with pytest.raises(MambuAPIException) as exc:
+        fast_retry_api.create_loan(loan_dict)
+    assert exc.value.code == 500
+
+
+def test_invalid_transition_rejected(mambuapi, unapproved_loan):
+    with pytest.raises(MambuAPIException) as exc:
+        mambuapi.disburse(unapproved_loan['id'])
+    assert exc.value.code == 400
+    assert exc.value.return_status == 'INVALID_ACCOUNT_STATE'
+
+
+def test_tranches_disbursed_in_order_then_repaid(mambuapi, approved_loan):
+    loan_id = approved_loan['id']
+    for _ in approved_loan['tranches']:
+        mambuapi.disburse(loan_id)
+    loan = mambuapi.get_loan(loan_id)
+    assert loan['principalBalance'] == '1200'
+    assert all('disbursementTransactionKey' in t for t in loan['tranches'])
+    with pytest.raises(MambuAPIException):
+        mambuapi.disburse(loan_id)
+    mambuapi.repayment(loan_id, 1200)
+    assert mambuapi.get_loan(loan_id)['accountState'] == 'CLOSED'
+
+
+def test_unknown_entity_is_404(mambuapi):
+    with pytest.raises(MambuAPIException) as exc:
+        mambuapi.get_client('does-not-exist')
+    assert exc.value.code == 404
+
+
+def test_adjustment_without_disbursement_rejected():
+    loan = dict(encodedKey='key', accountState='ACTIVE', tranches=[],
+                principalBalance='0')
+    with pytest.raises(StandInError) as exc:
+        MambuState()._transaction_disbursment_adjustment(loan, {})
+    assert exc.value.status_code == 400
+    assert exc.value.body['returnStatus'] == 'NO_DISBURSEMENT_TO_ADJUST'
+
+
+def test_invalid_custom_information_stores_nothing(mambuapi, user_dict):
+    with pytest.raises(MambuAPIException) as exc:
+        mambuapi.create_client(user_dict, custom_information=[{'value': 1}])
+    assert exc.value.code == 400
+    assert list(mambuapi.iter_clients(
+        dict(firstName=user_dict['firstName']))) == []
+
+
+def test_handler_errors_answered_with_500(standin, monkeypatch):
+    def _fail(rest, params, body):
+        raise KeyError('id')
+    monkeypatch.setattr(standin.state, '_get_loanproducts', _fail)
+    with API(standin.config(retries=0)) as api:
+        with pytest.raises(MambuAPIException) as exc:
+            api.get_loan_product('salary_advance')
+    assert exc.value.code == 500
+    assert exc.value.return_status == 'INTERNAL_ERROR'
+
+
+def test_recorded_requests_are_bounded():
+    standin = StandInMambu(max_requests=2)
+    try:
+        for path in ('/a', '/b', '/c'):
+            standin.record('GET', path)
+        assert list(standin.requests) == [('GET', '/b'), ('GET', '/c')]
+        assert standin.request_count == 3
+        assert standin.requests_since(2) == [('GET', '/c')]
+        assert standin.requests_since(0) == [('GET', '/b'), ('GET', '/c')]
+    finally:
+        standin.server.server_close()